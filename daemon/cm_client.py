@@ -1,223 +1,561 @@
+import asyncio
+import base64
+import functools
 import requests
+from requests.adapters import HTTPAdapter
+from requests_toolbelt import MultipartEncoder
+from urllib3.util.retry import Retry
 import time
 import logging
 import os
-import json
-import subprocess
+import orjson
+from prometheus_client import CollectorRegistry, Counter, Histogram
+import shutil
 import sys
-import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future
 from datetime import datetime, timedelta
+from urllib.parse import quote
+
+try:
+    from get_token import fetch_token_with_expiry
+except ImportError:
+    # get_token.py lives in the project root (parent of 'daemon' directory), which is not on
+    # sys.path when the daemon is started from another working directory.
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+    from get_token import fetch_token_with_expiry
 
 logger = logging.getLogger(__name__)
 
+# Process-wide metrics, exported by the daemon's metrics endpoint (see daemon_settings.metrics_port).
+# They live in their own registry so importing this module under two names doesn't register them twice.
+METRICS_REGISTRY = CollectorRegistry()
+TOKEN_REFRESH = Counter("cm_token_refresh_total", "Bearer token fetches by result", ["result"], registry=METRICS_REGISTRY)
+AUTH_RETRIES = Counter("cm_auth_retry_total", "Requests retried with a new token after a 401", registry=METRICS_REGISTRY)
+REQUEST_LATENCY = Histogram("cm_request_seconds", "CM API request latency by method and status", ["method", "status"], registry=METRICS_REGISTRY)
+
+def _body_preview(response, limit=512):
+    """Start of a response body for log messages, without decoding a possibly huge error page."""
+    content = getattr(response, "content", None) if response is not None else None
+    if not isinstance(content, (bytes, bytearray)):
+        return ""
+    return content[:limit].decode("utf-8", "replace")
+
+def _json_preview(value, limit=200):
+    """Short description of a parsed JSON value for log messages, without building the repr of large results."""
+    if isinstance(value, dict):
+        return f"object with keys {list(value)[:20]}"
+    if isinstance(value, list):
+        return f"array of {len(value)} items"
+    return repr(value)[:limit]
+
 class CMConnectionError(requests.exceptions.RequestException):
     """Custom exception for CM connection related errors."""
     pass
 
 class CMClient:
+    # Maximum number of ObjectIDs OR-ed into a single search query
+    OBJECT_ID_BATCH_SIZE = 100
+    # Worker threads used by bulk_delete/bulk_download; kept below the session's connection pool size
+    BULK_MAX_WORKERS = 16
+    # How long search_documents results are reused for an identical query
+    SEARCH_CACHE_TTL_SECONDS = 30
+    # Number of distinct search_documents queries kept in that cache
+    SEARCH_CACHE_SIZE = 256
+    # Results requested per search page
+    SEARCH_PAGE_SIZE = 100
+    # Number of GET responses kept with their ETag/Last-Modified for conditional re-requests
+    CONDITIONAL_GET_CACHE_SIZE = 256
+    # How long a test_connection() result is reused; cleared as soon as a request hits a connection error
+    CONNECTION_TEST_TTL_SECONDS = 5
+
     def __init__(self, api_base_url, auth_config):
         self.api_base_url = api_base_url.rstrip('/')
+        self._endpoint_prefix = self.api_base_url + '/' # Endpoint URLs are built by concatenation in _request
         self.auth_config = auth_config # Retain for default_token_validity_seconds etc.
         self._bearer_token = None # Initialize to None
-        self._token_renews_at = datetime.now() - timedelta(seconds=1) # Force initial fetch
+        # Renewal deadlines are time.monotonic() values so they are unaffected by wall-clock steps
+        self._token_renews_at_mono = time.monotonic() - 1 # Force initial fetch
+        self._token_stale_at_mono = None # Set once a token with a known lifetime is fetched
+        # Until this time the current token is served without any further checks (see get_bearer_token)
+        self._token_fresh_until_mono = float('-inf')
         self._session = requests.Session()
-        self._session.headers.update({"User-Agent": "CMDaemon/1.0"})
+        # Accept can be overridden per request; Authorization is kept in sync by _set_bearer_token
+        self._session.headers.update({"User-Agent": "CMDaemon/1.0", "Accept": "application/json", "Connection": "keep-alive"})
+        # Size the keep-alive pool for parallel uploads/downloads so workers don't discard sockets
+        # (the default adapter keeps at most 10 connections per host). With pool_block=False a burst
+        # beyond pool_maxsize still gets a connection; only the surplus is closed after use.
+        # Transient gateway errors and dropped connections are retried inside the adapter for
+        # idempotent methods only; POST (uploads, batch updates) is never resent to avoid duplicates.
+        # raise_on_status=False hands the last 5xx response back so _request still maps it to CMConnectionError.
+        # Backoff is exponential (0.3s, 0.6s, 1.2s) plus up to 0.1s of jitter so parallel workers don't retry in lockstep.
+        retry = Retry(total=3, backoff_factor=0.3, backoff_jitter=0.1, status_forcelist=(502, 503, 504),
+                      allowed_methods=frozenset(["GET", "PUT", "DELETE", "HEAD"]),
+                      respect_retry_after_header=True, raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=auth_config.get("http_pool_connections", 32),
+                              pool_maxsize=auth_config.get("http_pool_maxsize", 64),
+                              max_retries=retry, pool_block=False)
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
         
         self.token_expiry_threshold_seconds = auth_config.get("token_expiry_threshold_seconds", 300)
         # default_token_validity_seconds is used in _update_renewal_time if script doesn't provide expiry
         self.default_token_validity_seconds = auth_config.get("default_token_validity_seconds", 3600)
+        # Fraction of the renewal window after which the token is refreshed in the background
+        self.token_stale_fraction = auth_config.get("token_stale_fraction", 0.8)
+
+        # A configured bearer_token is used until it expires. Its JWT 'exp' claim, if present,
+        # sets the renewal time so a restart doesn't fetch a new token while the old one is valid.
+        initial_token = auth_config.get("bearer_token")
+        if initial_token:
+            self._set_bearer_token(initial_token)
+            token_expiry = self._jwt_expiry(initial_token)
+            if token_expiry is not None:
+                self._update_renewal_time(new_token_lifetime_seconds=token_expiry - time.time())
+
+        # Token refreshes run on a single background thread so concurrent callers share one fetch
+        self._refresh_lock = threading.Lock()
+        self._refresh_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cm-token-refresh")
+        self._refresh_future = None
+
+        # Pending ObjectID lookups, keyed by (object_id_field_name, item_type_context),
+        # each mapping an ObjectID to the futures of the callers waiting for its DocID.
+        # One resolve per key runs at a time (see _resolve_object_id); its lock lives in _object_id_resolve_locks.
+        self._object_id_lock = threading.Lock()
+        self._pending_object_ids = {}
+        self._object_id_resolve_locks = {}
+
+        # search_documents results keyed on (item_type_context, sorted criteria items, max_results),
+        # each stored as (monotonic expiry time, results list), least recently used first.
+        self._search_cache_lock = threading.Lock()
+        self._search_cache = OrderedDict()
+        # Search query templates keyed on (item_type_context, criteria keys); see _build_search_query
+        self._query_template_cache = {}
+
+        # JSON GET bodies keyed on (url, sorted params), each stored as (validator headers, raw body),
+        # least recently used first. A 304 reply to the validators reuses the stored body.
+        self._conditional_get_lock = threading.Lock()
+        self._conditional_get_cache = OrderedDict()
+
+        # Last test_connection() outcome as (monotonic expiry time, bool); concurrent callers share one check
+        self._connection_test_lock = threading.Lock()
+        self._connection_test_result = None
 
     def _update_renewal_time(self, new_token_lifetime_seconds=None, initial_setup=False):
         if initial_setup: # This case might become less relevant if token is always fetched initially
-            self._token_renews_at = datetime.now() - timedelta(seconds=1)
+            self._token_renews_at_mono = time.monotonic() - 1
+            self._token_stale_at_mono = None
+            self._token_fresh_until_mono = float('-inf')
             logger.info("Initial token setup. Renewal check forced on first API call.")
         else:
-            # Assume a fixed lifetime if not provided, e.g., 1 hour, since get_token.py doesn't give expiry.
+            # Assume a fixed lifetime if not provided, e.g., 1 hour, since get_token usually doesn't report an expiry.
             lifetime = new_token_lifetime_seconds if new_token_lifetime_seconds is not None else self.default_token_validity_seconds
             # self.token_expiry_threshold_seconds is how early we try to renew before actual expiry
-            self._token_renews_at = datetime.now() + timedelta(seconds=lifetime - self.token_expiry_threshold_seconds)
-            logger.info(f"Token renewal time updated. Next check/renewal around: {self._token_renews_at}. Assumed lifetime: {lifetime}s.")
+            renewal_window = lifetime - self.token_expiry_threshold_seconds
+            now = time.monotonic()
+            self._token_renews_at_mono = now + renewal_window
+            # Past this point the token is still served, but a background refresh is started
+            self._token_stale_at_mono = now + renewal_window * self.token_stale_fraction
+            self._token_fresh_until_mono = min(self._token_stale_at_mono, self._token_renews_at_mono)
+            # Wall-clock equivalent, only for the log message
+            renews_at = datetime.now() + timedelta(seconds=renewal_window)
+            logger.info(f"Token renewal time updated. Blocking renewal at: {renews_at} (background refresh after {renewal_window * self.token_stale_fraction:.0f}s). Assumed lifetime: {lifetime}s.")
+
+    def _set_bearer_token(self, token):
+        """Stores the token and updates the session's Authorization header to match."""
+        self._token_fresh_until_mono = float('-inf') # Until _update_renewal_time knows the new token's lifetime
+        self._bearer_token = token
+        if token:
+            self._session.headers["Authorization"] = f"Bearer {token}"
+        else:
+            self._session.headers.pop("Authorization", None)
+
+    @staticmethod
+    def _jwt_expiry(token):
+        """Returns the 'exp' claim (epoch seconds) of a JWT, or None if the token isn't a JWT or has no expiry."""
+        parts = token.split('.')
+        if len(parts) != 3:
+            return None
+        try:
+            payload = parts[1]
+            claims = orjson.loads(base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4)))
+            exp = claims.get("exp") if isinstance(claims, dict) else None
+            return float(exp) if exp is not None else None
+        except (ValueError, TypeError, orjson.JSONDecodeError):
+            return None
 
     def _is_token_expiring(self):
-        return datetime.now() >= self._token_renews_at
+        return time.monotonic() >= self._token_renews_at_mono
+
+    def _is_token_stale(self):
+        return self._token_stale_at_mono is not None and time.monotonic() >= self._token_stale_at_mono
 
     def _fetch_new_token_from_script(self):
-        logger.info("Attempting to fetch new token using get_token.py script.")
-        # Construct path to get_token.py assuming it's in the project root (parent of 'daemon' directory)
-        script_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'get_token.py'))
+        # Token acquisition runs in-process via get_token.fetch_token_with_expiry(),
+        # avoiding a Python interpreter spawn and stdout parsing on every refresh.
+        logger.info("Attempting to fetch new token using get_token.fetch_token_with_expiry().")
+        try:
+            token, expires_in = fetch_token_with_expiry(self._session) # Log in over the same keep-alive pool
+        except Exception as e:
+            logger.error(f"An unexpected error occurred while fetching a new token: {e}")
+            TOKEN_REFRESH.labels("fail").inc()
+            return False
 
-        if not os.path.exists(script_path):
-            logger.error(f"get_token.py script not found at {script_path}")
+        if not token:
+            logger.error("Token fetch did not return a token. See the get_token log messages for details.")
+            TOKEN_REFRESH.labels("fail").inc()
             return False
-        
-        command = [sys.executable, script_path]
-        try:
-            result = subprocess.run(command, capture_output=True, text=True, timeout=30, check=False)
-            
-            if result.returncode != 0:
-                logger.error(f"get_token.py script failed with exit code {result.returncode}.")
-                logger.error(f"Stderr: {result.stderr}")
-                return False
 
-            # Parse stdout for the token
-            # Expected output: "Successfully extracted Bearer Token: <token>" or "Successfully extracted Bearer Token from JSON response: <token>"
-            match = re.search(r"Successfully extracted Bearer Token(?: from JSON response)?: (.+)", result.stdout)
-            if match:
-                extracted_token = match.group(1).strip()
-                if extracted_token:
-                    logger.info("Successfully fetched new token from script.")
-                    self._bearer_token = extracted_token
-                    self._update_renewal_time() # Use default lifetime
-                    return True
-                else:
-                    logger.error("Token script output matched, but token was empty.")
-                    return False
-            else:
-                logger.error(f"Could not find token in get_token.py output. Stdout: {result.stdout}")
-                return False
+        logger.info("Successfully fetched new token.")
+        TOKEN_REFRESH.labels("ok").inc()
+        if expires_in is not None: # Taken from the JSON login response as-is, so it may be a string or junk
+            try:
+                expires_in = float(expires_in)
+            except (TypeError, ValueError):
+                logger.warning(f"Ignoring non-numeric token lifetime from the login response: {expires_in!r}")
+                expires_in = None
+        if expires_in is None: # The login response may not report a lifetime; the JWT itself might
+            token_expiry = self._jwt_expiry(token)
+            if token_expiry is not None:
+                expires_in = token_expiry - time.time()
+        with self._refresh_lock: # Swap token and renewal times together
+            self._set_bearer_token(token)
+            self._update_renewal_time(new_token_lifetime_seconds=expires_in) # Falls back to default lifetime if None
+        return True
 
-        except subprocess.TimeoutExpired:
-            logger.error(f"Timeout running get_token.py script at {script_path}.")
-            return False
-        except Exception as e:
-            logger.error(f"An unexpected error occurred while running get_token.py: {e}")
-            return False
+    def _submit_token_refresh(self):
+        """
+        Starts a token fetch on the background refresh thread unless one is already in flight.
+        Returns the future of the (possibly already running) fetch.
+        """
+        with self._refresh_lock:
+            if self._refresh_future is None or self._refresh_future.done():
+                # Re-check under the lock: a fetch that finished while this caller waited already renewed the token
+                if self._bearer_token and not self._is_token_expiring() and not self._is_token_stale():
+                    already_fresh = Future()
+                    already_fresh.set_result(True)
+                    return already_fresh
+                self._refresh_future = self._refresh_executor.submit(self._fetch_new_token_from_script)
+            return self._refresh_future
 
     def get_bearer_token(self):
+        # Fast path for every request while the token is fresh: one clock read and one comparison
+        if time.monotonic() < self._token_fresh_until_mono:
+            return self._bearer_token
         if not self._bearer_token or self._is_token_expiring():
-            logger.info("Bearer token is missing or expiring. Attempting to fetch new token from script.")
-            if not self._fetch_new_token_from_script(): # Changed from _refresh_token
-                logger.error("Failed to fetch new bearer token from script. Subsequent API calls may fail.")
+            logger.info("Bearer token is missing or expiring. Waiting for a new token.")
+            if not self._submit_token_refresh().result():
+                logger.error("Failed to fetch new bearer token. Subsequent API calls may fail.")
+        elif self._is_token_stale():
+            # Keep serving the current token while a fresh one is fetched off the request path
+            logger.debug("Bearer token is stale. Refreshing in the background.")
+            self._submit_token_refresh()
         return self._bearer_token
 
-    def _request(self, method, endpoint, **kwargs):
-        retried_after_auth_failure = kwargs.pop('_retried_after_auth_failure', False)
+    def _request(self, method, endpoint, response_kind="json", **kwargs):
+        """
+        Sends an authenticated request to the CM API. response_kind says how a successful response
+        is returned, so the Content-Type header doesn't have to be inspected:
+        'json' - the parsed body, or None for 204/empty bodies; 'stream' - the response object itself
+        (implies stream=True); 'bytes' - the raw body; 'none' - True, without reading the body.
+        4xx errors (after one 401 retry) return None; 5xx and transport errors raise CMConnectionError.
+        """
         token = self.get_bearer_token()
 
         if not token:
             logger.error("Cannot make API request: No valid bearer token.")
             return None 
 
-        headers = kwargs.pop("headers", {})
-        headers["Authorization"] = f"Bearer {token}"
-        # Accept header can be overridden by kwargs if needed for specific requests
-        headers.setdefault("Accept", "application/json")
+        # Authorization and Accept come from the session headers; only per-call overrides are passed
+        headers = kwargs.pop("headers", None)
+        timeout = kwargs.pop("timeout", 30) # Callers like test_connection pass a shorter timeout
+        if response_kind == "stream":
+            kwargs["stream"] = True
+        elif kwargs.get("stream", False):
+            response_kind = "stream"
 
-        url = f"{self.api_base_url}/{endpoint.lstrip('/')}"
+        url = self._endpoint_prefix + endpoint.lstrip('/')
         
-        # Log request details carefully, avoid logging full file contents or sensitive metadata
-        log_params = kwargs.get('params', None)
-        log_json = kwargs.get('json', None) # JSON body
-        log_data = kwargs.get('data', None) # Form data
-        if log_data and isinstance(log_data, dict) and 'attributes' in log_data and kwargs.get('files'):
-             # For multipart uploads, data field might contain sensitive metadata string
-             log_data_summary = {"attributes_keys": list(json.loads(log_data['attributes']).keys()) if isinstance(log_data.get('attributes'), str) else "Non-string attributes", "has_files": True}
-        else:
-             log_data_summary = log_data
+        # Log request details carefully, avoid logging full file contents or sensitive metadata.
+        # The summary (including re-parsing upload attributes) is only built when DEBUG is enabled.
+        if logger.isEnabledFor(logging.DEBUG):
+            log_params = kwargs.get('params', None)
+            log_json = kwargs.get('json', None) # JSON body
+            log_data = kwargs.get('data', None) # Form data
+            if isinstance(log_data, MultipartEncoder):
+                 # For multipart uploads, the attributes field might contain sensitive metadata string
+                 attributes = log_data.fields.get('attributes')
+                 log_data_summary = {"attributes_keys": list(orjson.loads(attributes).keys()) if isinstance(attributes, str) else "Non-string attributes", "has_files": 'file' in log_data.fields}
+            else:
+                 log_data_summary = log_data
 
-        logger.debug(f"Making API request: {method.upper()} {url} "
-                     f"Params: {log_params} JSON: {log_json} Data: {log_data_summary} "
-                     f"Stream: {kwargs.get('stream', False)}")
+            logger.debug("Making API request: %s %s Params: %s JSON: %s Data: %s Stream: %s",
+                         method.upper(), url, log_params, log_json, log_data_summary, kwargs.get('stream', False))
 
-        try:
-            # Pass through all other kwargs (like files, data, json, stream)
-            response = self._session.request(method, url, headers=headers, timeout=30, **kwargs)
-            response.raise_for_status() # Raises HTTPError for bad responses (4xx or 5xx)
+        # JSON bodies are encoded once with orjson instead of requests' stdlib json, and reused on a 401 retry
+        json_body = kwargs.pop("json", None)
+        if json_body is not None:
+            kwargs["data"] = orjson.dumps(json_body)
+            headers = dict(headers or {})
+            headers.setdefault("Content-Type", "application/json")
 
-            if kwargs.get('stream', False): # If streaming, return the response object directly
-                logger.debug(f"Successful streaming response from {url}. Status: {response.status_code}")
-                return response 
-            
-            if response.status_code == 204: # No Content
-                logger.debug(f"Successful request to {url} with 204 No Content.")
-                return None # Or a specific success indicator if preferred over None
-            
-            # Check content type before assuming JSON.
-            content_type = response.headers.get('Content-Type', '')
-            if 'application/json' in content_type:
+        # Revalidate JSON GETs seen before with If-None-Match/If-Modified-Since instead of refetching them
+        conditional_key = None
+        cached_get = None
+        if response_kind == "json" and method.upper() == "GET":
+            params = kwargs.get("params")
+            try:
+                conditional_key = (url, tuple(sorted(params.items())) if params else ())
+                hash(conditional_key)
+            except (AttributeError, TypeError): # Non-dict or unhashable params are not cached
+                conditional_key = None
+        if conditional_key is not None:
+            with self._conditional_get_lock:
+                cached_get = self._conditional_get_cache.get(conditional_key)
+                if cached_get is not None:
+                    self._conditional_get_cache.move_to_end(conditional_key)
+            if cached_get is not None:
+                headers = dict(headers or {}, **cached_get[0])
+
+        # At most two attempts: the second one only after a 401 and a successful token refresh
+        for attempt in range(2):
+            try:
+                # Pass through all other kwargs (like files, data, json, stream)
+                started = time.perf_counter()
                 try:
-                    json_response = response.json()
-                    logger.debug(f"Successful JSON response from {url}. Status: {response.status_code}. Response snippet: {str(json_response)[:200]}")
+                    response = self._session.request(method, url, headers=headers, timeout=timeout, **kwargs)
+                except requests.exceptions.RequestException:
+                    REQUEST_LATENCY.labels(method.upper(), "error").observe(time.perf_counter() - started)
+                    raise
+                REQUEST_LATENCY.labels(method.upper(), str(response.status_code)).observe(time.perf_counter() - started)
+                response.raise_for_status() # Raises HTTPError for bad responses (4xx or 5xx)
+
+                if response.status_code == 304 and cached_get is not None:
+                    logger.debug("Not modified: %s. Using the stored response body.", url)
+                    return orjson.loads(cached_get[1]) # Parsed afresh so callers never share (and mutate) one object
+
+                if response_kind == "stream": # If streaming, return the response object directly
+                    logger.debug("Successful streaming response from %s. Status: %s", url, response.status_code)
+                    return response 
+                if response_kind == "none":
+                    logger.debug("Successful request to %s. Status: %s", url, response.status_code)
+                    return True
+                if response_kind == "bytes":
+                    logger.debug("Successful response from %s. Status: %s. Length: %s", url, response.status_code, len(response.content))
+                    return response.content
+
+                if response.status_code == 204 or not response.content: # No Content
+                    logger.debug("Successful request to %s with no content. Status: %s", url, response.status_code)
+                    return None
+                try:
+                    json_response = orjson.loads(response.content) # Faster than response.json() on large search results
+                    if conditional_key is not None:
+                        self._store_conditional_get(conditional_key, response)
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug("Successful JSON response from %s. Status: %s. Response snippet: %s", url, response.status_code, _json_preview(json_response))
                     return json_response
-                except ValueError as e: # JSONDecodeError
-                    logger.error(f"Failed to decode JSON response from {url}. Status: {response.status_code}. Error: {e}. Response text: {response.text[:500]}")
+                except orjson.JSONDecodeError as e:
+                    logger.error(f"Failed to decode JSON response from {url}. Status: {response.status_code}. Error: {e}. Response text: {_body_preview(response)}")
                     # Treat as an error, but not necessarily a CMConnectionError unless status was 5xx
                     return None # Or raise a specific content error
-            else:
-                # For non-JSON, non-streaming responses (e.g. XML, plain text, or unexpected)
-                logger.debug(f"Successful non-JSON response from {url}. Status: {response.status_code}. Content-Type: {content_type}. Length: {len(response.content)}")
-                return response.content # Or response.text, depending on expected non-JSON content
-        
-        except requests.exceptions.ConnectionError as e:
-            logger.error(f"Connection error during API request to {url}: {e}")
-            raise CMConnectionError(f"Connection error to {url}: {e}") from e
-        except requests.exceptions.Timeout as e:
-            logger.error(f"Timeout during API request to {url}: {e}")
-            raise CMConnectionError(f"Timeout during API request to {url}: {e}") from e
-        except requests.exceptions.HTTPError as e:
-            logger.error(f"HTTP error during API request to {url}: {e.response.status_code} {e.response.text}")
-            if e.response.status_code == 401 and not retried_after_auth_failure:
-                logger.warning("Authentication failed (401). Attempting to fetch a new token and retry.")
-                self._bearer_token = None # Invalidate old token
-                self._token_renews_at = datetime.now() - timedelta(seconds=1) # Force expiry check
+            
+            except requests.exceptions.ConnectionError as e:
+                logger.error(f"Connection error during API request to {url}: {e}")
+                self._connection_test_result = None # CM looks down; the next test_connection() must really check
+                raise CMConnectionError(f"Connection error to {url}: {e}") from e
+            except requests.exceptions.Timeout as e:
+                logger.error(f"Timeout during API request to {url}: {e}")
+                self._connection_test_result = None
+                raise CMConnectionError(f"Timeout during API request to {url}: {e}") from e
+            except requests.exceptions.HTTPError as e:
+                logger.error(f"HTTP error during API request to {url}: {e.response.status_code} {_body_preview(e.response)}")
+                if e.response.status_code == 401 and attempt == 0:
+                    logger.warning("Authentication failed (401). Attempting to fetch a new token and retry.")
+                    self._set_bearer_token(None) # Invalidate old token
+                    self._token_renews_at_mono = time.monotonic() - 1 # Force expiry check
+                    
+                    if self.get_bearer_token(): # This will attempt to fetch; the session header is updated with it
+                        logger.info("Retrying the original request with a new token.")
+                        AUTH_RETRIES.inc()
+                        self._rewind_multipart_body(kwargs)
+                        continue
+                    else:
+                        logger.error("Failed to obtain a new token after 401. Propagating original 401 error.")
+                        # Fall through to raise CMConnectionError or return None as per original logic for non-5xx
                 
-                new_token = self.get_bearer_token() # This will attempt to fetch
-                if new_token:
-                    logger.info("Retrying the original request with a new token.")
-                    kwargs['_retried_after_auth_failure'] = True # Mark that we've retried
-                    return self._request(method, endpoint, **kwargs) # Recursive call
-                else:
-                    logger.error("Failed to obtain a new token after 401. Propagating original 401 error.")
-                    # Fall through to raise CMConnectionError or return None as per original logic for non-5xx
+                if e.response.status_code in [500, 502, 503, 504]: # Server-side issues
+                    self._connection_test_result = None
+                    raise CMConnectionError(f"CM Server Error ({e.response.status_code}) for {url}: {_body_preview(e.response)}") from e
+                # For other 4xx errors, or 401 on retry, they are logged, and _request will return None.
+            except requests.exceptions.RequestException as e: # Catch-all for other request issues including ConnectionError, Timeout
+                logger.error(f"Generic error during API request to {url}: {e}")
+                self._connection_test_result = None
+                raise CMConnectionError(f"Generic request error for {url}: {e}") from e
             
-            if e.response.status_code in [500, 502, 503, 504]: # Server-side issues
-                raise CMConnectionError(f"CM Server Error ({e.response.status_code}) for {url}: {e.response.text}") from e
-            # For other 4xx errors, or 401 on retry, they are logged, and _request will return None.
-        except requests.exceptions.RequestException as e: # Catch-all for other request issues including ConnectionError, Timeout
-            logger.error(f"Generic error during API request to {url}: {e}")
-            raise CMConnectionError(f"Generic request error for {url}: {e}") from e
-        
+            return None
         return None
 
+    def _store_conditional_get(self, key, response):
+        """Remembers a JSON GET body together with its ETag/Last-Modified, if the server sent either."""
+        validators = {}
+        etag = response.headers.get("ETag")
+        if isinstance(etag, str):
+            validators["If-None-Match"] = etag
+        last_modified = response.headers.get("Last-Modified")
+        if isinstance(last_modified, str):
+            validators["If-Modified-Since"] = last_modified
+        with self._conditional_get_lock:
+            if not validators:
+                self._conditional_get_cache.pop(key, None)
+                return
+            self._conditional_get_cache[key] = (validators, response.content)
+            self._conditional_get_cache.move_to_end(key)
+            if len(self._conditional_get_cache) > self.CONDITIONAL_GET_CACHE_SIZE:
+                self._conditional_get_cache.popitem(last=False)
+
+    @staticmethod
+    def _rewind_multipart_body(request_kwargs):
+        """
+        A streamed multipart body is consumed by the attempt that failed. Rewind its file parts
+        and re-encode it with the same boundary so the Content-Type header stays valid.
+        """
+        data = request_kwargs.get('data')
+        if not isinstance(data, MultipartEncoder):
+            return
+        for value in data.fields.values():
+            if isinstance(value, tuple) and len(value) > 1 and hasattr(value[1], 'seek'):
+                value[1].seek(0)
+        request_kwargs['data'] = MultipartEncoder(fields=data.fields, boundary=data.boundary_value)
+
     # --- Document Operations ---
 
-    def search_documents(self, criteria, item_type_context=None):
+    def _build_search_query(self, criteria, item_type_context=None):
+        """
+        Builds the 'q' search parameter from criteria, or returns None if there is nothing to search for.
+        The query shape only depends on the item type and the criteria keys, so it is built once per
+        shape as a format template and later calls just fill in the values.
+        """
+        template_key = (item_type_context, tuple(criteria))
+        template = self._query_template_cache.get(template_key)
+        if template is None:
+            query_parts = []
+            if item_type_context:
+                # Assuming CM syntax for itemtype, adjust if different (e.g., "/Document" or "//@itemType=\"Document\"")
+                query_parts.append(f"itemtype='{self._escape_format(self._quote_literal(item_type_context))}'")
+
+            for index, key in enumerate(criteria):
+                # Simple query construction: assumes string equality. Adjust for other operators or data types.
+                # This is a placeholder for actual CM query syntax.
+                query_parts.append(f"@{self._escape_format(key)}='{{{index}}}'") # Example: @attributeName='value'
+
+            if not query_parts:
+                return None
+
+            # Example CM query: "/Document[@attributeName=\"value\" and @anotherAttr=\"value\"]"
+            # For simplicity here, using a flat q param: "itemtype='Document' AND @attr1='val1'"
+            # This needs to be adapted to the specific CM's query language.
+            # The example uses a more generic q=key:val structure
+            template = " AND ".join(query_parts)
+            self._query_template_cache[template_key] = template
+        return template.format(*(self._quote_literal(value) for value in criteria.values()))
+
+    @staticmethod
+    def _escape_format(text):
+        """Escapes braces so item types and attribute names are literal text in a query template."""
+        return str(text).replace("{", "{{").replace("}", "}}")
+
+    @staticmethod
+    def _quote_literal(value):
+        """Doubles single quotes so a value can't end the '...' string literal it is placed in."""
+        return str(value).replace("'", "''")
+
+    def iter_search_documents(self, criteria, item_type_context=None, page_size=None, max_results=None):
+        """
+        Searches for documents page by page (limit/offset) and yields item representations (dicts).
+        While the caller works through one page, the next one is already fetched on a helper thread.
+        page_size: results per request, defaults to SEARCH_PAGE_SIZE.
+        max_results: stop after this many results (e.g. 2 to detect an ambiguous match cheaply).
+        Raises CMConnectionError on connection problems; a malformed response ends the iteration.
+        """
+        query_string = self._build_search_query(criteria, item_type_context)
+        if query_string is None:
+            logger.warning("Search documents called with no criteria or item_type_context.")
+            return
+        page_size = page_size or self.SEARCH_PAGE_SIZE
+        if max_results is not None:
+            page_size = min(page_size, max_results)
+
+        def fetch_page(offset):
+            # Assuming search endpoint is /search and takes a query string 'q'
+            return self._request("GET", "search", params={"q": query_string, "limit": page_size, "offset": offset})
+
+        logger.info(f"Searching documents with query: {query_string}")
+        yielded = 0
+        offset = 0
+        previous_first = None
+        prefetcher = None
+        response_json = fetch_page(offset)
+        try:
+            while True:
+                if not (isinstance(response_json, dict) and isinstance(response_json.get("results"), list)):
+                    logger.warning(f"Search response was empty or not in expected format. Query: {query_string}. Response: {_json_preview(response_json)}")
+                    return
+                results = response_json["results"]
+                if results and previous_first is not None and results[0] == previous_first:
+                    return # Server ignores offset and repeats the same page
+                previous_first = results[0] if results else None
+                offset += len(results)
+
+                # A full page means there may be more; a longer one means the server doesn't paginate
+                next_page = None
+                if len(results) == page_size and (max_results is None or yielded + len(results) < max_results):
+                    if prefetcher is None:
+                        prefetcher = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cm-search-prefetch")
+                    next_page = prefetcher.submit(fetch_page, offset)
+
+                for item in results:
+                    if max_results is not None and yielded >= max_results:
+                        return
+                    yield item
+                    yielded += 1
+
+                if next_page is None:
+                    return
+                response_json = next_page.result()
+        finally:
+            logger.debug("Search returned %s documents for query: %s", yielded, query_string)
+            if prefetcher is not None:
+                prefetcher.shutdown(wait=False)
+
+    def search_documents(self, criteria, item_type_context=None, max_results=None):
         """
         Searches for documents based on criteria.
         Criteria: dict, e.g., {"attribute_name": "value", "another_attr": "another_value"}
         item_type_context: string, e.g., "Document" to scope search.
+        max_results: optional cap on the number of results fetched.
         Returns a list of item representations (dicts) or an empty list.
         """
-        query_parts = []
-        if item_type_context:
-            # Assuming CM syntax for itemtype, adjust if different (e.g., "/Document" or "//@itemType=\"Document\"")
-            query_parts.append(f"itemtype='{item_type_context}'") 
-        
-        for key, value in criteria.items():
-            # Simple query construction: assumes string equality. Adjust for other operators or data types.
-            # This is a placeholder for actual CM query syntax.
-            query_parts.append(f"@{key}='{value}'") # Example: @attributeName='value'
-        
-        if not query_parts:
-            logger.warning("Search documents called with no criteria or item_type_context.")
-            return []
-
-        # Example CM query: "/Document[@attributeName=\"value\" and @anotherAttr=\"value\"]"
-        # For simplicity here, using a flat q param: "itemtype='Document' AND @attr1='val1'"
-        # This needs to be adapted to the specific CM's query language.
-        # The example uses a more generic q=key:val structure
-        query_string = " AND ".join(query_parts)
-        logger.info(f"Searching documents with query: {query_string}")
+        try:
+            cache_key = (item_type_context, tuple(sorted(criteria.items())), max_results)
+            hash(cache_key)
+        except TypeError: # Unhashable criteria values are searched without caching
+            cache_key = None
+        if cache_key is not None:
+            with self._search_cache_lock:
+                cached = self._search_cache.get(cache_key)
+                if cached is not None:
+                    if cached[0] > time.monotonic():
+                        self._search_cache.move_to_end(cache_key)
+                    else:
+                        del self._search_cache[cache_key]
+                        cached = None
+            if cached is not None:
+                logger.debug("Returning cached search results for criteria: %s", criteria)
+                return list(cached[1])
 
         try:
-            # Assuming search endpoint is /search and takes a query string 'q'
-            response_json = self._request("GET", "search", params={"q": query_string})
-            if response_json and "results" in response_json and isinstance(response_json["results"], list):
-                logger.info(f"Search returned {len(response_json['results'])} documents.")
-                return response_json["results"]
-            else:
-                logger.warning(f"Search response was empty or not in expected format. Query: {query_string}. Response: {str(response_json)[:200]}")
-                return []
+            results = list(self.iter_search_documents(criteria, item_type_context, max_results=max_results))
         except CMConnectionError as e:
             logger.error(f"Connection error during search: {e}")
             return [] # Return empty list on connection error
@@ -225,6 +563,117 @@ class CMClient:
             logger.error(f"Unexpected error during search: {e}")
             return []
 
+        logger.info(f"Search returned {len(results)} documents.")
+        if results and cache_key is not None: # Empty results (possibly a malformed response) are not cached
+            now = time.monotonic()
+            with self._search_cache_lock:
+                # Drop expired entries on the way in, then the least recently used ones beyond the size limit
+                for key in [key for key, (expires, _) in self._search_cache.items() if expires <= now]:
+                    del self._search_cache[key]
+                self._search_cache[cache_key] = (now + self.SEARCH_CACHE_TTL_SECONDS, list(results))
+                self._search_cache.move_to_end(cache_key)
+                while len(self._search_cache) > self.SEARCH_CACHE_SIZE:
+                    self._search_cache.popitem(last=False)
+        return results
+
+    def invalidate_search_cache(self):
+        """Drops all cached search_documents results, e.g. after modifying documents."""
+        with self._search_cache_lock:
+            self._search_cache.clear()
+
+    def resolve_object_ids(self, object_ids, object_id_field_name, item_type_context=None):
+        """
+        Resolves many ObjectIDs to DocIDs with one search per OBJECT_ID_BATCH_SIZE ObjectIDs.
+        object_ids: iterable of ObjectID values.
+        object_id_field_name: String, the attribute name holding the ObjectID.
+        item_type_context: String, item type for disambiguation.
+        Returns a dict {object_id: doc_id} for the ObjectIDs that were found.
+        """
+        unique_ids = list(dict.fromkeys(object_ids)) # De-duplicate, keep order
+        resolved = {}
+        for start in range(0, len(unique_ids), self.OBJECT_ID_BATCH_SIZE):
+            chunk = unique_ids[start:start + self.OBJECT_ID_BATCH_SIZE]
+            id_clause = " OR ".join(f"@{object_id_field_name}='{self._quote_literal(oid)}'" for oid in chunk)
+            query_string = f"({id_clause})"
+            if item_type_context:
+                query_string = f"itemtype='{self._quote_literal(item_type_context)}' AND {query_string}"
+            logger.info(f"Resolving {len(chunk)} ObjectIDs with query: {query_string}")
+
+            try:
+                response_json = self._request("GET", "search", params={"q": query_string})
+            except CMConnectionError as e:
+                logger.error(f"Connection error while resolving ObjectIDs: {e}")
+                return resolved
+            except Exception as e:
+                logger.error(f"Unexpected error while resolving ObjectIDs: {e}")
+                return resolved
+
+            results = response_json.get("results") if isinstance(response_json, dict) else None
+            if not isinstance(results, list):
+                logger.warning(f"ObjectID search response was empty or not in expected format. Response: {_json_preview(response_json)}")
+                continue
+
+            unmatched_results = False
+            for item in results:
+                # The ObjectID attribute may be returned top-level or nested under 'attributes'
+                attributes = item.get("attributes") if isinstance(item.get("attributes"), dict) else {}
+                oid = attributes.get(object_id_field_name, item.get(object_id_field_name))
+                doc_id = item.get("id")
+                if oid is None and len(chunk) == 1:
+                    oid = chunk[0] # A single-ObjectID query needs no echo: every result belongs to it
+                if oid is None or not doc_id:
+                    if oid is None:
+                        unmatched_results = True
+                    logger.warning(f"Search result lacks '{object_id_field_name}' or 'id' field. Search result: {str(item)[:200]}")
+                    continue
+                oid = str(oid)
+                if oid in resolved:
+                    logger.warning(f"Multiple documents found for {object_id_field_name}='{oid}' (itemtype: {item_type_context}). Using the first one: {resolved[oid]}")
+                    continue
+                resolved[oid] = doc_id
+
+            if unmatched_results:
+                # The server doesn't echo the ObjectID attribute, so results can't be told apart;
+                # look up the ObjectIDs this chunk left unresolved one at a time instead
+                for oid in chunk:
+                    if str(oid) not in resolved:
+                        resolved.update(self.resolve_object_ids([oid], object_id_field_name, item_type_context))
+        return resolved
+
+    def _resolve_object_id(self, object_id, object_id_field_name, item_type_context=None):
+        """
+        Resolves a single ObjectID to a DocID. A lone caller resolves straight away; lookups that arrive
+        while a resolve for the same field and item type is in flight are coalesced into the next
+        resolve_object_ids() call.
+        Returns the DocID, or None if no document was found.
+        """
+        key = (object_id_field_name, item_type_context)
+        future = Future()
+        with self._object_id_lock:
+            batch = self._pending_object_ids.get(key)
+            is_leader = batch is None
+            if is_leader:
+                batch = self._pending_object_ids[key] = {}
+                resolve_lock = self._object_id_resolve_locks.setdefault(key, threading.Lock())
+            batch.setdefault(str(object_id), []).append(future)
+
+        if is_leader:
+            # The first caller of a batch waits only for a resolve already in flight; everyone arriving
+            # meanwhile joins this batch, which is then resolved as a whole
+            with resolve_lock:
+                with self._object_id_lock:
+                    batch = self._pending_object_ids.pop(key)
+                try:
+                    resolved = self.resolve_object_ids(batch.keys(), object_id_field_name, item_type_context)
+                except Exception as e:
+                    for waiting in batch.values():
+                        for f in waiting:
+                            f.set_exception(e)
+                else:
+                    for oid, waiting in batch.items():
+                        for f in waiting:
+                            f.set_result(resolved.get(oid))
+        return future.result()
 
     def upload_document(self, file_path, item_type, metadata=None):
         """
@@ -234,33 +683,39 @@ class CMClient:
         metadata: dict of additional attributes.
         Returns the new document ID if successful, else None.
         """
-        if not os.path.exists(file_path):
-            logger.error(f"File not found for upload: {file_path}")
-            return None
-
         metadata_payload = metadata.copy() if metadata else {}
         # Ensure 'itemtype' is part of the metadata payload sent to CM
         # The exact structure (e.g., top-level key, or inside 'attributes') depends on the API.
         metadata_payload["itemtype"] = item_type 
         
-        # Prepare for multipart/form-data request
-        # 'file' part for the content, 'attributes' (or similar) part for JSON metadata string
-        files = {'file': (os.path.basename(file_path), open(file_path, 'rb'))}
-        # CM might expect metadata as a JSON string in a form field, e.g., 'attributes' or 'properties'.
-        data = {'attributes': json.dumps(metadata_payload)} 
-        
         logger.info(f"Uploading document: {file_path} as item type: {item_type} with metadata: {metadata_payload}")
         
         try:
-            # Assuming POST to /items for creating new items
-            response_json = self._request("POST", "items", files=files, data=data)
+            # The 'with' block closes the file handle on every path, including CMConnectionError.
+            with open(file_path, 'rb') as fh:
+                # Prepare a streamed multipart/form-data body: the file is read in chunks while sending
+                # instead of being loaded into memory first.
+                # 'file' part for the content, 'attributes' (or similar) part for JSON metadata string
+                # CM might expect metadata as a JSON string in a form field, e.g., 'attributes' or 'properties'.
+                encoder = MultipartEncoder(fields={
+                    'attributes': orjson.dumps(metadata_payload).decode(), # Compact JSON string
+                    'file': (os.path.basename(file_path), fh, 'application/octet-stream'),
+                })
+                # Assuming POST to /items for creating new items
+                # The encoder sizes the file part with os.fstat on the open handle, and requests sets
+                # Content-Length from its len, so the body is sent with a known length rather than chunked framing.
+                response_json = self._request("POST", "items", data=encoder,
+                                              headers={"Content-Type": encoder.content_type})
             if response_json and response_json.get("id"):
                 doc_id = response_json["id"]
                 logger.info(f"Successfully uploaded document {file_path}. New DocID: {doc_id}")
                 return doc_id
             else:
-                logger.error(f"Upload failed for {file_path}. Response: {str(response_json)[:200]}")
+                logger.error(f"Upload failed for {file_path}. Response: {_json_preview(response_json)}")
                 return None
+        except FileNotFoundError: # Checked by open() itself rather than a separate os.path.exists() stat
+            logger.error(f"File not found for upload: {file_path}")
+            return None
         except CMConnectionError as e:
             logger.error(f"Connection error during upload of {file_path}: {e}")
             # Do not raise CMConnectionError from here; let the caller (main.py) handle it
@@ -277,17 +732,18 @@ class CMClient:
         """
         logger.info(f"Attempting to download document ID '{doc_id}' to '{target_path}'.")
         # Assuming endpoint like /items/{doc_id}/datastreams/content
-        endpoint = f"items/{doc_id}/datastreams/content"
+        # The DocID is percent-encoded so IDs containing spaces, '/' or '?' stay a single path segment
+        endpoint = f"items/{quote(str(doc_id), safe='')}/datastreams/content"
         
         try:
-            response = self._request("GET", endpoint, stream=True) # Returns the response object on success
+            response = self._request("GET", endpoint, response_kind="stream") # Returns the response object on success
             if response: # If _request was successful and returned the response object
                 try:
+                    # Let urllib3 undo any Content-Encoding, then copy in 1 MiB blocks in C
+                    # instead of looping over small iter_content chunks in Python.
+                    response.raw.decode_content = True
                     with open(target_path, 'wb') as f:
-                        for chunk in response.iter_content(chunk_size=8192):
-                            # filter out keep-alive new chunks
-                            if chunk: 
-                                f.write(chunk)
+                        shutil.copyfileobj(response.raw, f, length=1024 * 1024)
                     logger.info(f"Successfully downloaded document '{doc_id}' to '{target_path}'.")
                     return True
                 except IOError as e:
@@ -314,19 +770,16 @@ class CMClient:
         Returns True if successful (e.g. 204 No Content), False otherwise.
         """
         logger.info(f"Attempting to delete document ID '{doc_id}'.")
-        endpoint = f"items/{doc_id}"
+        endpoint = f"items/{quote(str(doc_id), safe='')}"
         
         try:
-            # _request returns None for 204 No Content, which is success for DELETE
-            result = self._request("DELETE", endpoint)
-            if result is None: # Assuming 204 No Content is the success indicator
+            # The response body is not needed: _request returns True for any 2xx and None for 4xx errors
+            if self._request("DELETE", endpoint, response_kind="none"):
                 logger.info(f"Successfully deleted document '{doc_id}'.")
                 return True
             else:
-                # This case might occur if the API returns some JSON body on delete (uncommon for 204)
-                # or if _request logic changes to return a specific success object.
-                logger.warning(f"Delete request for document '{doc_id}' returned an unexpected response: {str(result)[:200]}")
-                return False # Or interpret based on 'result' if API has specific success response
+                logger.warning(f"Delete request for document '{doc_id}' was rejected by the server (see previous error).")
+                return False
         except CMConnectionError as e:
             logger.error(f"Connection error deleting document '{doc_id}': {e}")
             return False
@@ -334,6 +787,57 @@ class CMClient:
             logger.error(f"Unexpected error deleting document '{doc_id}': {e}")
             return False
 
+    def bulk_delete(self, doc_ids):
+        """
+        Deletes many documents concurrently over the shared session.
+        doc_ids: iterable of DocIDs.
+        Returns a dict {doc_id: bool} with the per-document outcome.
+        """
+        doc_ids = list(doc_ids)
+        if not doc_ids:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(self.BULK_MAX_WORKERS, len(doc_ids)), thread_name_prefix="cm-bulk-delete") as executor:
+            results = dict(zip(doc_ids, executor.map(self.delete_document, doc_ids)))
+        logger.info(f"Bulk delete finished: {sum(results.values())} of {len(results)} documents deleted.")
+        return results
+
+    def bulk_download(self, pairs):
+        """
+        Downloads many documents concurrently over the shared session.
+        pairs: iterable of (doc_id, target_path) tuples.
+        Returns a dict {doc_id: bool} with the per-document outcome.
+        """
+        pairs = list(pairs)
+        if not pairs:
+            return {}
+        doc_ids = [doc_id for doc_id, _ in pairs]
+        target_paths = [target_path for _, target_path in pairs]
+        with ThreadPoolExecutor(max_workers=min(self.BULK_MAX_WORKERS, len(pairs)), thread_name_prefix="cm-bulk-download") as executor:
+            results = dict(zip(doc_ids, executor.map(self.download_document, doc_ids, target_paths)))
+        logger.info(f"Bulk download finished: {sum(results.values())} of {len(results)} documents downloaded.")
+        return results
+
+    async def download_documents_async(self, pairs, concurrency=32):
+        """
+        Awaitable variant of bulk_download for asyncio callers.
+        Downloads run on up to 'concurrency' executor threads over the shared keep-alive session,
+        so token handling and 401 retries behave exactly as in download_document.
+        pairs: iterable of (doc_id, target_path) tuples.
+        Returns a dict {doc_id: bool} with the per-document outcome.
+        """
+        pairs = list(pairs)
+        if not pairs:
+            return {}
+        loop = asyncio.get_running_loop()
+        with ThreadPoolExecutor(max_workers=min(concurrency, len(pairs)), thread_name_prefix="cm-async-download") as executor:
+            outcomes = await asyncio.gather(*(
+                loop.run_in_executor(executor, self.download_document, doc_id, target_path)
+                for doc_id, target_path in pairs
+            ))
+        results = dict(zip((doc_id for doc_id, _ in pairs), outcomes))
+        logger.info(f"Async download finished: {sum(results.values())} of {len(results)} documents downloaded.")
+        return results
+
     def update_document_metadata(self, doc_id_or_object_id, metadata, id_is_object_id=False, object_id_field_name=None, item_type_context=None):
         """
         Updates metadata for a document.
@@ -351,18 +855,9 @@ class CMClient:
                 logger.error("ObjectID field name not provided for metadata update using ObjectID.")
                 return False
             logger.info(f"Updating metadata by ObjectID: searching for item with {object_id_field_name}='{doc_id_or_object_id}' and itemtype='{item_type_context}'.")
-            search_criteria = {object_id_field_name: doc_id_or_object_id}
-            search_results = self.search_documents(search_criteria, item_type_context=item_type_context)
-            
-            if not search_results:
-                logger.error(f"No document found with {object_id_field_name}='{doc_id_or_object_id}' (itemtype: {item_type_context}) for metadata update.")
-                return False
-            if len(search_results) > 1:
-                logger.warning(f"Multiple documents found for {object_id_field_name}='{doc_id_or_object_id}' (itemtype: {item_type_context}). Using the first one: {search_results[0].get('id')}")
-            
-            actual_doc_id = search_results[0].get("id")
+            actual_doc_id = self._resolve_object_id(doc_id_or_object_id, object_id_field_name, item_type_context=item_type_context)
             if not actual_doc_id:
-                logger.error(f"Found document via ObjectID but it lacks an 'id' field. Search result: {str(search_results[0])[:200]}")
+                logger.error(f"No document found with {object_id_field_name}='{doc_id_or_object_id}' (itemtype: {item_type_context}) for metadata update.")
                 return False
             logger.info(f"Found DocID {actual_doc_id} for ObjectID {doc_id_or_object_id}.")
 
@@ -370,34 +865,16 @@ class CMClient:
         # Assuming PUT to /items/{doc_id} with a body like {"attributes": metadata_dict}
         # Or perhaps PATCH /items/{doc_id} if the API supports partial updates.
         # Or PUT /items/{doc_id}/attributes
-        endpoint = f"items/{actual_doc_id}" 
+        endpoint = f"items/{quote(str(actual_doc_id), safe='')}" 
         payload = {"attributes": metadata} # Adjust payload structure as per actual API
 
         try:
             response_json = self._request("PUT", endpoint, json=payload) # _request returns None for 204 or 4xx non-CMConnectionError
-            if response_json is not None: # Handles 200 OK with JSON body
-                logger.info(f"Successfully updated metadata for document '{actual_doc_id}'. Response: {str(response_json)[:200]}")
-                return True
-            # If response_json is None, it could be a 204 (success) or a 4xx (client error).
-            # The current _request implementation logs 4xx errors but returns None, same as for 204.
-            # For this method, we'll consider _request returning None as a potential success if it's a 204,
-            # but we can't reliably distinguish from 4xx without changing _request.
-            # The subtask says "Success Response: JSON of the updated item or HTTP 200/204."
-            # If _request logged a 4xx error and returned None, this will be incorrectly treated as possible 204 success here without further checks.
-            # To be safer, let's assume None means "not a JSON body success".
-            # If a 204 is a definitive success and _request returns None for it, this logic needs _request to signal it.
-            # For now, only a non-None response is a clear success for PUT with metadata.
-            # If the API *guarantees* 204 for successful PUT and _request returns None for 204, then this would be:
-            # if response_json is None and not <way_to_check_if_4xx_error_logged_by_request>: return True
-            # This is complex. Simpler: if API returns JSON on success, check for that. If it can return 204 on success,
-            # this method needs a clearer signal from _request.
-            # Given the ambiguity, treating "None" as "not a success with a body" is safer.
-            # The log in _request for 4xx errors would be the primary indicator of client errors.
             # The _request method returns the JSON response for 200/201 with JSON body,
             # raw content for other successful responses, or None for 204 No Content
             # or if a non-CMConnectionError HTTP error (like 4xx) occurred.
             if response_json is not None: # Typically means 200 OK with JSON body
-                logger.info(f"Successfully updated metadata for document '{actual_doc_id}'. Response: {str(response_json)[:200]}")
+                logger.info(f"Successfully updated metadata for document '{actual_doc_id}'. Response: {_json_preview(response_json)}")
                 return True
             else:
                 # If _request returned None, it could be a successful 204 No Content,
@@ -416,16 +893,64 @@ class CMClient:
             logger.error(f"Unexpected error updating metadata for document '{actual_doc_id}': {e}")
             return False
 
+    def update_document_metadata_bulk(self, items, max_workers=None):
+        """
+        Updates metadata for many documents identified by DocID or ObjectID.
+        ObjectIDs are resolved up front with one search per (object_id_field_name, item_type_context) group
+        (see resolve_object_ids), then the PUTs are issued concurrently over the shared keep-alive session.
+        items: list of dicts in the metadata job format: {"doc_id": ...} or {"object_id": ..., "object_id_field_name": ...,
+               "item_type_context": ...}, plus "metadata": dict.
+        max_workers: concurrent PUTs, defaults to BULK_MAX_WORKERS.
+        Returns a list of bools, one per item in the same order.
+        """
+        if not items:
+            return []
+        groups = {}
+        for item in items:
+            if not item.get("doc_id") and item.get("object_id") and item.get("object_id_field_name"):
+                groups.setdefault((item["object_id_field_name"], item.get("item_type_context")), []).append(item["object_id"])
+        resolved = {}
+        for (field_name, item_type), object_ids in groups.items():
+            try:
+                found = self.resolve_object_ids(object_ids, field_name, item_type_context=item_type)
+            except CMConnectionError as e:
+                logger.error(f"Connection error resolving {len(object_ids)} ObjectIDs for bulk metadata update: {e}")
+                found = {}
+            resolved.update(((field_name, item_type, object_id), doc_id) for object_id, doc_id in found.items())
+
+        def update_one(item):
+            doc_id = item.get("doc_id") or resolved.get((item.get("object_id_field_name"), item.get("item_type_context"), item.get("object_id")))
+            if not doc_id or not isinstance(item.get("metadata"), dict):
+                logger.error(f"No document or metadata for bulk metadata update item: {item}")
+                return False
+            return self.update_document_metadata(doc_id, item["metadata"])
+
+        with ThreadPoolExecutor(max_workers=min(max_workers or self.BULK_MAX_WORKERS, len(items)), thread_name_prefix="cm-bulk-update") as executor:
+            outcomes = list(executor.map(update_one, items))
+        logger.info(f"Bulk metadata update (PUT) finished: {sum(outcomes)} of {len(outcomes)} documents updated.")
+        return outcomes
+
     def test_connection(self):
         '''
         A simple method to test connectivity, e.g. by fetching a non-sensitive, lightweight endpoint.
         Adjust endpoint to something suitable for IBM CM (e.g., a server status or root API endpoint).
+        The result is reused for CONNECTION_TEST_TTL_SECONDS, and callers arriving while a check
+        is running wait for its result instead of issuing their own.
         '''
+        with self._connection_test_lock:
+            cached = self._connection_test_result
+            if cached is not None and time.monotonic() < cached[0]:
+                return cached[1]
+            result = self._check_connection()
+            self._connection_test_result = (time.monotonic() + self.CONNECTION_TEST_TTL_SECONDS, result)
+            return result
+
+    def _check_connection(self):
         logger.debug("Testing connection to IBM CM API...") # Changed to debug for less noise on successful tests
         try:
             # Pass a specific timeout for connection test.
             # The endpoint "/" should be a lightweight, non-authenticated (or using existing auth) endpoint if possible.
-            response_data = self._request("GET", "/", timeout=10) # Example timeout
+            response_data = self._request("GET", "/", response_kind="none", timeout=10) # Example timeout; the body is not needed
             
             if response_data is not None:
                 # Depending on the API, root "/" might return specific data or just a status.
@@ -444,3 +969,62 @@ class CMClient:
         except Exception as e: # Catch any other unexpected error from _request
             logger.error(f"Unexpected error during connection test: {e}")
             return False
+
+    def close(self):
+        """Closes the pooled keep-alive connections and stops the token refresh thread."""
+        self._refresh_executor.shutdown(wait=False)
+        self._session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class AsyncCMClient:
+    """
+    asyncio interface to a CMClient for callers that fan out many operations, e.g.
+    await asyncio.gather(*(client.update_document_metadata(d, m) for d, m in updates)).
+    Each call runs the synchronous CMClient method on a shared, bounded worker pool, so the pooled
+    keep-alive session, token refresh, 401 retry and ObjectID coalescing all behave exactly as in CMClient.
+    """
+
+    def __init__(self, cm_client, max_concurrency=32):
+        self._client = cm_client
+        # Keep max_concurrency at or below the session's http_pool_maxsize so every worker has a socket
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="cm-async")
+
+    async def _call(self, method, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(method, *args, **kwargs))
+
+    async def search_documents(self, criteria, item_type_context=None, max_results=None):
+        return await self._call(self._client.search_documents, criteria, item_type_context, max_results=max_results)
+
+    async def upload_document(self, file_path, item_type, metadata=None):
+        return await self._call(self._client.upload_document, file_path, item_type, metadata)
+
+    async def download_document(self, doc_id, target_path):
+        return await self._call(self._client.download_document, doc_id, target_path)
+
+    async def delete_document(self, doc_id):
+        return await self._call(self._client.delete_document, doc_id)
+
+    async def update_document_metadata(self, doc_id_or_object_id, metadata, id_is_object_id=False, object_id_field_name=None, item_type_context=None):
+        return await self._call(self._client.update_document_metadata, doc_id_or_object_id, metadata,
+                                id_is_object_id=id_is_object_id, object_id_field_name=object_id_field_name,
+                                item_type_context=item_type_context)
+
+    async def test_connection(self):
+        return await self._call(self._client.test_connection)
+
+    def close(self):
+        """Stops the worker pool; operations already running are allowed to finish."""
+        self._executor.shutdown(wait=False)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.close()
@@ -1,15 +1,52 @@
-import json
+import atexit
+import errno
 import logging
 import logging.handlers # Added
+import mmap
 import os
+import queue
+import random
+import re
 import time
 import shutil
+import signal
 import fnmatch
-from .cm_client import CMClient, CMConnectionError
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import threading
+from collections import namedtuple
+import functools
+import heapq
+import orjson
+from .cm_client import CMClient, CMConnectionError, METRICS_REGISTRY
+from prometheus_client import start_http_server
+from concurrent.futures import ThreadPoolExecutor
 
-# Global flag to indicate CM connection status
-daemon_paused_due_to_cm_outage = False
+logger = logging.getLogger(__name__)
+
+# Metadata job items handed to CMClient.update_document_metadata_bulk per call
+METADATA_UPDATE_CHUNK_SIZE = 100
+
+# Set while CM is unreachable: job and scan loops stop handing out work until the main loop reconnects
+daemon_paused = threading.Event()
+
+# Main-loop control: SIGTERM sets shutdown_event, SIGHUP (and SIGTERM) set wakeup_event to cut an idle wait short
+shutdown_event = threading.Event()
+wakeup_event = threading.Event()
+
+# Background thread that writes queued log records to the rotating file (see setup_logging)
+_log_queue_listener = None
+
+# Upper bound for job/scan worker pools: these threads mostly wait on CM I/O, so a few per CPU is plenty
+MAX_WORKERS_PER_CPU = 4
+
+# A download job entry after validation in the submitting thread; raw is the original job dict
+DownloadItem = namedtuple("DownloadItem", "doc_id target_filename target_path raw")
+
+# The scan_directories entry fields each upload needs, read once per scan_directory call
+ScanConfig = namedtuple("ScanConfig", "path item_type action_after_upload move_target_dir recursive")
+
+# Directories already created (or confirmed) by _ensure_dir, shared by all worker threads
+_ensured_dirs = set()
+_ensured_dirs_lock = threading.Lock()
 
 # Determine the absolute path to the config file relative to this script
 # __file__ is the path to the current script (daemon/main.py)
@@ -20,6 +57,83 @@ DEFAULT_CONFIG_PATH = os.path.abspath(os.path.join(
     os.path.dirname(__file__), '..', 'config', 'config.json'
 ))
 
+def _load_json_file(path):
+    """Parses a JSON file straight from a read-only mapping instead of copying it into a bytes object first."""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return orjson.loads(b"") # mmap cannot map empty files; let orjson raise its usual decode error
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+            return orjson.loads(view)
+
+def _cap_workers(requested, setting_name):
+    """Limits a configured worker count to MAX_WORKERS_PER_CPU threads per CPU."""
+    limit = (os.cpu_count() or 1) * MAX_WORKERS_PER_CPU
+    if requested > limit:
+        logging.warning(f"{setting_name} ({requested}) exceeds {limit} ({MAX_WORKERS_PER_CPU} per CPU), using {limit}.")
+        return limit
+    return requested
+
+def _ensure_dir(path):
+    """
+    Creates path (like os.makedirs) unless this process already did so or saw it exist.
+    Returns True if the directory had to be created. Raises OSError like os.makedirs.
+    """
+    with _ensured_dirs_lock:
+        if path in _ensured_dirs:
+            return False
+        created = not os.path.isdir(path)
+        if created:
+            os.makedirs(path, exist_ok=True)
+        _ensured_dirs.add(path)
+        return created
+
+def _forget_dir(path):
+    """Makes the next _ensure_dir(path) check the filesystem again, e.g. after a move into path failed."""
+    with _ensured_dirs_lock:
+        _ensured_dirs.discard(path)
+
+def _idle(seconds):
+    """Waits up to seconds in the main loop; returns early when woken by a signal."""
+    if wakeup_event.wait(timeout=seconds):
+        wakeup_event.clear()
+
+def _handle_shutdown_signal(signum, frame):
+    shutdown_event.set()
+    wakeup_event.set()
+
+def _handle_wakeup_signal(signum, frame):
+    wakeup_event.set()
+
+def pause_daemon(reason):
+    """Pauses job and scan processing until the main loop's reconnect check succeeds."""
+    if not daemon_paused.is_set():
+        logging.warning(f"Pausing daemon: {reason}")
+    daemon_paused.set()
+
+def _reserve_unique_path(target_dir, base_filename, max_attempts=1000):
+    """
+    Atomically creates an empty placeholder in target_dir: base_filename, then name_1.ext, name_2.ext, ...
+    Returns (fd, path) for the first name that did not exist yet, or (None, None) after max_attempts.
+    """
+    name, ext = os.path.splitext(base_filename)
+    for counter in range(max_attempts):
+        candidate = base_filename if counter == 0 else f"{name}_{counter}{ext}"
+        path = os.path.join(target_dir, candidate)
+        try:
+            return os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644), path
+        except FileExistsError:
+            continue
+    return None, None
+
+def _move_file(src, dst):
+    """Moves src to dst with a single rename(2) when both are on one filesystem; copies via shutil.move otherwise."""
+    try:
+        os.replace(src, dst)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        shutil.move(src, dst)
+
 def move_to_failed_archive(file_path, failed_archive_root_dir, reason_subdir=None):
     if not os.path.exists(file_path):
         logging.warning(f"File {file_path} not found, cannot move to failed archive.")
@@ -34,63 +148,85 @@ def move_to_failed_archive(file_path, failed_archive_root_dir, reason_subdir=Non
         target_dir = os.path.join(failed_archive_root_dir, reason_subdir)
 
     try:
-        if not os.path.exists(target_dir):
-            os.makedirs(target_dir, exist_ok=True)
+        if _ensure_dir(target_dir):
             logging.info(f"Created failed archive subdirectory: {target_dir}")
     except OSError as e:
         logging.error(f"Could not create failed archive directory {target_dir}: {e}. File {file_path} will not be moved.")
         return
 
     base_filename = os.path.basename(file_path)
-    destination_path = os.path.join(target_dir, base_filename)
-
-    # Handle potential naming conflicts by appending a timestamp
-    if os.path.exists(destination_path):
-        name, ext = os.path.splitext(base_filename)
-        timestamp = time.strftime("%Y%m%d%H%M%S")
-        destination_path = os.path.join(target_dir, f"{name}_{timestamp}{ext}")
-        # If it STILL exists (highly unlikely for timestamped), log and skip or add counter
-        if os.path.exists(destination_path):
-            logging.warning(f"Timestamped file {destination_path} already exists in failed archive. Skipping move for {file_path}")
-            return
+
+    # Reserve the destination name first so concurrent moves of equally named files cannot overwrite each other
+    try:
+        fd, destination_path = _reserve_unique_path(target_dir, base_filename)
+    except OSError as e:
+        _forget_dir(target_dir)
+        logging.error(f"Could not reserve a destination for {file_path} in {target_dir}: {e}")
+        return
+    if fd is None:
+        logging.warning(f"No free name for {base_filename} in failed archive {target_dir}. Skipping move for {file_path}")
+        return
+    os.close(fd)
 
     try:
-        shutil.move(file_path, destination_path)
+        _move_file(file_path, destination_path)
         logging.info(f"Moved file {file_path} to failed archive: {destination_path}")
     except (OSError, shutil.Error) as e:
+        # The directory may have been removed behind our back; check it again next time
+        _forget_dir(target_dir)
+        try:
+            os.remove(destination_path)  # Drop the empty placeholder
+        except OSError:
+            pass
         logging.error(f"Failed to move {file_path} to {destination_path}: {e}")
 
+def _publish_download(temp_path, target_path):
+    """
+    Links a finished download into place without overwriting: returns False if target_path already exists
+    (e.g. another item of the job, or a name differing only in case on a case-insensitive filesystem).
+    Falls back to a checked os.replace where the filesystem doesn't support hard links.
+    """
+    try:
+        os.link(temp_path, target_path)
+    except FileExistsError:
+        return False
+    except OSError:
+        if os.path.exists(target_path):
+            return False
+        os.replace(temp_path, target_path)
+    return True # A linked temp_path is removed by the caller
+
 # Helper function for process_download_job_file
-def _process_single_download(item_to_download, target_dir_base, job_name_for_logging, cm_client):
-    doc_id = item_to_download.get("doc_id")
-    target_filename = item_to_download.get("target_filename", doc_id) 
-    
-    if not doc_id:
-        logging.warning(f"Download item in job '{job_name_for_logging}' missing 'doc_id'. Item: {item_to_download}")
-        return {"status": "skipped_no_docid", "doc_id": None, "target_path": None, "item_data": item_to_download}
-    if not target_filename: 
-        logging.warning(f"Download item for DocID {doc_id} in job '{job_name_for_logging}' missing 'target_filename' and doc_id fallback failed.")
-        return {"status": "skipped_no_filename", "doc_id": doc_id, "target_path": None, "item_data": item_to_download}
-
-    full_target_path = os.path.join(target_dir_base, target_filename)
+# item is a DownloadItem already validated (and checked against existing files) by process_download_job_file
+def _process_single_download(item, job_name_for_logging, cm_client):
+    doc_id, full_target_path = item.doc_id, item.target_path
     
-    result_payload = {"doc_id": doc_id, "target_path": full_target_path, "status": "pending_thread", "item_data": item_to_download}
+    result_payload = {"doc_id": doc_id, "target_path": full_target_path, "status": "pending_thread", "item_data": item.raw}
 
-    if os.path.exists(full_target_path):
-        logging.warning(f"Target file {full_target_path} already exists. Skipping download for DocID {doc_id} in job '{job_name_for_logging}'.")
-        result_payload["status"] = "skipped_exists"
+    if daemon_paused.is_set(): # Queued before another worker hit a CM outage
+        result_payload["status"] = "skipped_paused"
         return result_payload
-        
-    logging.info(f"Thread: Attempting to download DocID {doc_id} to {full_target_path} for job '{job_name_for_logging}'.")
+
+    temp_path = None
+    # Per-item messages use lazy %-formatting so suppressed levels cost no string building
+    logging.info("Thread: Attempting to download DocID %s to %s for job '%s'.", doc_id, full_target_path, job_name_for_logging)
     try:
         if not cm_client:
             logging.error(f"CMClient not available (thread). Cannot download DocID {doc_id}.")
             result_payload["status"] = "failed_no_client"
             return result_payload
 
-        if cm_client.download_document(doc_id, full_target_path):
-            logging.info(f"Thread: Successfully downloaded DocID {doc_id} to {full_target_path}.")
-            result_payload["status"] = "success"
+        # Download under a hidden temporary name and only link the complete file into place, so a crash or a
+        # failed download never leaves a partial or empty file that later runs would skip as "already exists"
+        target_dir, target_name = os.path.split(full_target_path)
+        temp_path = os.path.join(target_dir, f".{target_name}.{os.getpid()}-{threading.get_ident()}.part")
+        if cm_client.download_document(doc_id, temp_path):
+            if _publish_download(temp_path, full_target_path):
+                logging.info("Thread: Successfully downloaded DocID %s to %s.", doc_id, full_target_path)
+                result_payload["status"] = "success"
+            else:
+                logging.warning(f"Thread: Target file {full_target_path} appeared during the download of DocID {doc_id}. Keeping the existing file.")
+                result_payload["status"] = "skipped_exists"
         else:
             logging.warning(f"Thread: Download failed for DocID {doc_id} (CM operation returned False) to {full_target_path}.")
             result_payload["status"] = "failed_cm_operation"
@@ -102,16 +238,46 @@ def _process_single_download(item_to_download, target_dir_base, job_name_for_log
         result_payload["status"] = "failed_unexpected_thread"
         result_payload["error_message"] = str(e)
         return result_payload
+    finally:
+        if temp_path is not None:
+            try:
+                os.remove(temp_path) # The linked original, or what a failed download left behind
+            except OSError:
+                pass
+
+def _record_download_result(future, submitted_doc_id, job_name, summary):
+    """Adds the outcome of a finished (or cancelled) _process_single_download future to the job summary."""
+    if future.cancelled(): # Dropped from the queue after a CM outage
+        summary["skipped_downloads"] += 1
+        return
+    try:
+        result = future.result() # This will re-raise CMConnectionError if it occurred in the thread
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            logging.debug("Thread download result for DocID %s (job: %s): %s", submitted_doc_id, job_name, result)
+        
+        status = result.get("status", "failed_unexpected_result_format") # Default if result format is wrong
+        if status == "success":
+            summary["successful_downloads"] += 1
+        elif status in ("skipped_paused", "skipped_exists"):
+            summary["skipped_downloads"] += 1
+        else: # Covers "failed_cm_operation", "failed_no_client", "failed_unexpected_thread", etc.
+            summary["failed_downloads"] += 1
+    except CMConnectionError as e:
+        logging.error(f"CM connection error during threaded download for DocID {submitted_doc_id} (job: {job_name}): {e}. Pausing daemon.")
+        pause_daemon(f"CM connection error while downloading DocID {submitted_doc_id}")
+        summary["failed_downloads"] += 1 # Count this item as failed
+    except Exception as exc: 
+        logging.error(f"Unexpected exception for DocID {submitted_doc_id} (job: {job_name}) during future.result(): {exc}", exc_info=True)
+        summary["failed_downloads"] += 1 # Count as failed
 
 def process_download_job_file(job_file_path, cm_client, global_config, failed_archive_dir): # failed_archive_dir not directly used by this function
     logger.info(f"Processing download job file: {job_file_path}")
     try:
-        with open(job_file_path, 'r') as f:
-            job_data = json.load(f)
+        job_data = _load_json_file(job_file_path)
     except FileNotFoundError:
         logger.error(f"Download job file not found: {job_file_path}")
         return {"status": "error", "message": "Job file not found", "summary": {"successful_downloads": 0, "failed_downloads": 0, "skipped_downloads": 0}}
-    except json.JSONDecodeError as e:
+    except orjson.JSONDecodeError as e:
         logger.error(f"Error decoding JSON from job file {job_file_path}: {e}")
         return {"status": "error", "message": f"JSON decode error: {e}", "summary": {"successful_downloads": 0, "failed_downloads": 0, "skipped_downloads": 0}}
 
@@ -135,7 +301,17 @@ def process_download_job_file(job_file_path, cm_client, global_config, failed_ar
         return {"status": "error", "message": f"Failed to create target directory: {e}", "summary": {"successful_downloads": 0, "failed_downloads": 0, "skipped_downloads": 0}}
 
     summary = {"successful_downloads": 0, "failed_downloads": 0, "skipped_downloads": 0}
-    global daemon_paused_due_to_cm_outage # Ensure global flag is accessible
+
+    # One directory listing instead of an os.path.exists() per item. Target paths already taken by earlier
+    # items of this job are added as they are submitted; anything the snapshot misses (e.g. a name differing
+    # only in case on a case-insensitive filesystem) is still caught when the download is linked into place.
+    try:
+        with os.scandir(target_dir_base) as entries:
+            existing_names = {entry.name for entry in entries}
+    except OSError as e:
+        logger.warning(f"Could not list target directory {target_dir_base} for job '{job_name}': {e}. Falling back to per-file checks.")
+        existing_names = None
+    submitted_targets = set()
 
     items_to_download = job_data.get("downloads", [])
     if not items_to_download:
@@ -146,74 +322,94 @@ def process_download_job_file(job_file_path, cm_client, global_config, failed_ar
     if not isinstance(max_downloads, int) or max_downloads <= 0:
         logging.warning(f"Invalid max_parallel_downloads value ({max_downloads}), defaulting to 1.")
         max_downloads = 1
+    max_downloads = _cap_workers(max_downloads, "max_parallel_downloads")
     
     logging.info(f"Processing {len(items_to_download)} download items for job '{job_name}' using up to {max_downloads} worker(s).")
 
-    with ThreadPoolExecutor(max_workers=max_downloads) as executor:
-        futures = {}
-        for item_idx, item_data in enumerate(items_to_download): # Using enumerate for better logging if needed
-            if daemon_paused_due_to_cm_outage:
+    # Finished downloads are counted by a done-callback on the worker thread. The semaphore bounds the number of
+    # queued downloads so a large manifest is fed to the workers as they free up instead of all up front.
+    pending_slots = threading.BoundedSemaphore(max_downloads * 2)
+    summary_lock = threading.Lock() # Guards summary and pending
+    pending = set() # Submitted downloads not finished yet; cancelled as soon as the daemon pauses
+
+    def on_download_done(future, doc_id):
+        try:
+            with summary_lock:
+                pending.discard(future)
+                _record_download_result(future, doc_id, job_name, summary)
+                to_cancel = list(pending) if daemon_paused.is_set() else []
+            # Outside the lock: cancelling runs the cancelled futures' callbacks (this function) right here
+            for queued in to_cancel:
+                queued.cancel() # Only succeeds for downloads that have not started yet
+        finally:
+            pending_slots.release()
+
+    # Pull the fields out and build the target paths once here rather than in every worker
+    download_items = []
+    for d in items_to_download:
+        target_filename = d.get("target_filename", d.get("doc_id"))
+        target_path = os.path.join(target_dir_base, target_filename) if target_filename else None
+        download_items.append(DownloadItem(d.get("doc_id"), target_filename, target_path, d))
+
+    with ThreadPoolExecutor(max_workers=max_downloads, thread_name_prefix="cm-download") as executor:
+        for item_idx, item in enumerate(download_items): # Using enumerate for better logging if needed
+            if daemon_paused.is_set():
                 logging.info(f"Daemon paused, stopping submission of new download tasks for job '{job_name}'.")
                 # Update summary for remaining items that were not submitted
                 # This assumes items not submitted are 'skipped' due to pause.
-                summary["skipped_downloads"] += (len(items_to_download) - item_idx)
+                with summary_lock:
+                    summary["skipped_downloads"] += (len(items_to_download) - item_idx)
                 break 
             
             if not cm_client: 
                 logging.error(f"CMClient not available. Cannot submit download tasks for job '{job_name}'.")
-                daemon_paused_due_to_cm_outage = True # Critical failure
-                summary["failed_downloads"] += (len(items_to_download) - item_idx) # Mark remaining as failed
+                pause_daemon("CMClient not available for download job") # Critical failure
+                with summary_lock:
+                    summary["failed_downloads"] += (len(items_to_download) - item_idx) # Mark remaining as failed
                 break
             
             # Basic validation before submitting to thread
-            doc_id_for_item = item_data.get("doc_id")
-            if not doc_id_for_item:
-                logging.warning(f"Skipping item in job '{job_name}' (index {item_idx}) due to missing 'doc_id': {item_data}")
-                summary["skipped_downloads"] += 1
+            if not item.doc_id:
+                logging.warning(f"Skipping item in job '{job_name}' (index {item_idx}) due to missing 'doc_id': {item.raw}")
+                with summary_lock:
+                    summary["skipped_downloads"] += 1
                 continue
-            
-            # The helper _process_single_download will handle path construction and existence checks
-            future = executor.submit(_process_single_download, item_data, target_dir_base, job_name, cm_client)
-            futures[future] = doc_id_for_item # Use doc_id for tracking/logging
-
-        for future in as_completed(futures):
-            submitted_doc_id = futures[future] 
-            try:
-                result = future.result() # This will re-raise CMConnectionError if it occurred in the thread
-                logging.debug(f"Thread download result for DocID {submitted_doc_id} (job: {job_name}): {result}")
-                
-                status = result.get("status", "failed_unexpected_result_format") # Default if result format is wrong
-                if status == "success":
-                    summary["successful_downloads"] += 1
-                elif status in ["skipped_exists", "skipped_no_docid", "skipped_no_filename"]:
+            if not item.target_filename:
+                logging.warning(f"Skipping DocID {item.doc_id} in job '{job_name}' (index {item_idx}): empty 'target_filename'.")
+                with summary_lock:
                     summary["skipped_downloads"] += 1
-                else: # Covers "failed_cm_operation", "failed_no_client", "failed_unexpected_thread", etc.
-                    summary["failed_downloads"] += 1
-            except CMConnectionError as e:
-                logging.error(f"CM connection error during threaded download for DocID {submitted_doc_id} (job: {job_name}): {e}. Pausing daemon.")
-                daemon_paused_due_to_cm_outage = True
-                summary["failed_downloads"] += 1 # Count this item as failed
-                # No need to cancel other futures here, as_completed won't yield them if they raise.
-                # The main pause check at the start of the outer loop will handle daemon pause.
-                break # Stop processing further results for *this job file*
-            except Exception as exc: 
-                logging.error(f"Unexpected exception for DocID {submitted_doc_id} (job: {job_name}) during future.result(): {exc}", exc_info=True)
-                summary["failed_downloads"] += 1 # Count as failed
+                continue
+            if item.target_path in submitted_targets:
+                target_exists = True
+            elif existing_names is not None and os.path.dirname(item.target_filename) == "":
+                target_exists = item.target_filename in existing_names
+            else: # Nested target paths aren't in the snapshot of target_dir_base
+                target_exists = os.path.exists(item.target_path)
+            if target_exists:
+                logging.warning(f"Target file {item.target_path} already exists. Skipping download for DocID {item.doc_id} in job '{job_name}'.")
+                with summary_lock:
+                    summary["skipped_downloads"] += 1
+                continue
             
-            if daemon_paused_due_to_cm_outage: # If a parallel task (or this one) set the pause flag
-                logging.warning(f"Daemon pause detected during future processing for download job '{job_name}'. Halting results processing.")
-                break # Stop processing results for this job file.
+            submitted_targets.add(item.target_path)
+            pending_slots.acquire()
+            future = executor.submit(_process_single_download, item, job_name, cm_client)
+            with summary_lock:
+                pending.add(future)
+            future.add_done_callback(functools.partial(on_download_done, doc_id=item.doc_id))
+        # Leaving the with-block waits for the submitted downloads; after a pause the queued ones are cancelled
+        # (or return "skipped_paused"), so the summary still accounts for every submitted item
     
     # Construct final status and message based on summary and pause state
     final_status = "success"
     message = f"Job '{job_name}' completed."
-    if daemon_paused_due_to_cm_outage and (summary["failed_downloads"] > 0 or summary["skipped_downloads"] > 0): #Check if pause occurred AND there were issues
+    if daemon_paused.is_set() and (summary["failed_downloads"] > 0 or summary["skipped_downloads"] > 0): #Check if pause occurred AND there were issues
         final_status = "partial_error" 
         message = f"Job '{job_name}' processing interrupted by CM connection outage. Summary reflects tasks processed before or during interruption."
     elif summary["failed_downloads"] > 0 or summary["skipped_downloads"] > 0:
         final_status = "completed_with_issues"
         message = f"Job '{job_name}' completed with some issues. See summary."
-    elif daemon_paused_due_to_cm_outage: # Pause occurred but no failures/skips recorded before pause (e.g. paused on first item)
+    elif daemon_paused.is_set(): # Pause occurred but no failures/skips recorded before pause (e.g. paused on first item)
         final_status = "partial_error"
         message = f"Job '{job_name}' processing interrupted by CM connection outage. No items were fully processed."
 
@@ -221,89 +417,39 @@ def process_download_job_file(job_file_path, cm_client, global_config, failed_ar
     logger.info(f"Finished processing download job '{job_name}'. Status: {final_status}. Summary: {summary}")
     return {"status": final_status, "message": message, "summary": summary}
 
+@functools.lru_cache(maxsize=4)
+def _load_config_cached(config_path, mtime_ns, size):
+    # mtime_ns and size are only part of the cache key: an edited file gets a new entry
+    return _load_json_file(config_path)
+
 def load_config(config_path=DEFAULT_CONFIG_PATH):
-    """Loads the configuration from a JSON file."""
+    """
+    Loads the configuration from a JSON file.
+    The parsed result is cached until the file's mtime or size changes, so callers must not modify it.
+    """
     try:
-        with open(config_path, 'r') as f:
-            config = json.load(f)
+        st = os.stat(config_path)
+        config = _load_config_cached(config_path, st.st_mtime_ns, st.st_size)
         logging.info(f"Configuration loaded successfully from {config_path}")
         return config
     except FileNotFoundError:
         logging.error(f"Configuration file not found: {config_path}")
         return None
-    except json.JSONDecodeError as e:
+    except orjson.JSONDecodeError as e:
         logging.error(f"Error decoding JSON from {config_path}: {e}")
         return None
     except Exception as e:
         logging.error(f"An unexpected error occurred while loading config from {config_path}: {e}")
         return None
 
-# Helper function for process_metadata_update_job_file
-def _process_single_metadata_update(item_to_update, job_name_for_logging, cm_client):
-    doc_id = item_to_update.get("doc_id")
-    object_id = item_to_update.get("object_id")
-    object_id_field = item_to_update.get("object_id_field_name")
-    item_type_ctx = item_to_update.get("item_type_context")
-    metadata_to_update = item_to_update.get("metadata")
-
-    item_identifier_log = doc_id if doc_id else f"ObjectID {object_id} (field: {object_id_field}, type: {item_type_ctx})"
-    result_payload = {"identifier": item_identifier_log, "status": "pending_thread", "item_data": item_to_update}
-
-    if not metadata_to_update or not isinstance(metadata_to_update, dict):
-        logging.warning(f"Skipping metadata update in job '{job_name_for_logging}' for {item_identifier_log} due to missing or invalid 'metadata'.")
-        result_payload["status"] = "skipped_no_metadata"
-        return result_payload
-    
-    if not (doc_id or (object_id and object_id_field and item_type_ctx)):
-        logging.warning(f"Skipping metadata update in job '{job_name_for_logging}' due to insufficient identifiers for item: {item_to_update}")
-        result_payload["status"] = "skipped_no_identifier"
-        return result_payload
-
-    logging.info(f"Thread: Attempting to update metadata for {item_identifier_log} in job '{job_name_for_logging}'.")
-    try:
-        if not cm_client:
-            logging.error(f"CMClient not available (thread). Cannot update metadata for {item_identifier_log}.")
-            result_payload["status"] = "failed_no_client"
-            return result_payload
-
-        update_success = False
-        if doc_id:
-            update_success = cm_client.update_document_metadata(
-                doc_id, metadata_to_update, id_is_object_id=False
-            )
-        else: # Must be object_id case based on earlier validation
-            update_success = cm_client.update_document_metadata(
-                object_id,
-                metadata_to_update,
-                id_is_object_id=True,
-                object_id_field_name=object_id_field,
-                item_type_context=item_type_ctx
-            )
-        
-        if update_success:
-            logging.info(f"Thread: Successfully updated metadata for {item_identifier_log}.")
-            result_payload["status"] = "success"
-        else:
-            logging.warning(f"Thread: Failed to update metadata for {item_identifier_log} (CM operation returned False).")
-            result_payload["status"] = "failed_cm_operation"
-        return result_payload
-    except CMConnectionError:
-        raise
-    except Exception as e:
-        logging.error(f"Thread: Unexpected error updating metadata for {item_identifier_log}: {e}", exc_info=True)
-        result_payload["status"] = "failed_unexpected_thread"
-        result_payload["error_message"] = str(e)
-        return result_payload
-
 def process_metadata_update_job_file(job_file_path, cm_client, global_config):
     logger.info(f"Processing metadata update job file: {job_file_path}")
     try:
-        with open(job_file_path, 'r') as f:
-            job_data = json.load(f)
+        job_data = _load_json_file(job_file_path)
     except FileNotFoundError:
         logger.error(f"Metadata update job file not found: {job_file_path}")
         return {"status": "error", "message": "Job file not found", "summary": {"successful_updates": 0, "failed_updates": 0, "skipped_updates": 0}}
-    except json.JSONDecodeError as e:
+    except orjson.JSONDecodeError as e:
         logger.error(f"Error decoding JSON from job file {job_file_path}: {e}")
         return {"status": "error", "message": f"JSON decode error: {e}", "summary": {"successful_updates": 0, "failed_updates": 0, "skipped_updates": 0}}
 
@@ -311,7 +457,6 @@ def process_metadata_update_job_file(job_file_path, cm_client, global_config):
     logger.info(f"Starting metadata update job: {job_name}")
 
     summary = {"successful_updates": 0, "failed_updates": 0, "skipped_updates": 0}
-    global daemon_paused_due_to_cm_outage
 
     items_to_update = job_data.get("updates", [])
     if not items_to_update:
@@ -320,83 +465,83 @@ def process_metadata_update_job_file(job_file_path, cm_client, global_config):
 
     max_updates = global_config.get("performance", {}).get("max_parallel_metadata_updates", 1)
     if not isinstance(max_updates, int) or max_updates <= 0:
-        logging.warning(f"Invalid max_parallel_metadata_updates value ({max_updates}), defaulting to 1.")
+        logger.warning(f"Invalid max_parallel_metadata_updates value ({max_updates}), defaulting to 1.")
         max_updates = 1
+    max_updates = _cap_workers(max_updates, "max_parallel_metadata_updates")
+
+    # Validate everything first; valid items are then sent in chunks through the client's bulk update,
+    # which resolves each chunk's ObjectIDs with one search instead of one search per item.
+    valid_items = []
+    for item_idx, item_data in enumerate(items_to_update):
+        if not item_data.get("metadata") or not isinstance(item_data.get("metadata"), dict):
+            logger.warning(f"Skipping item in job '{job_name}' (index {item_idx}) due to missing or invalid 'metadata': {item_data.get('doc_id') or item_data.get('object_id')}")
+            summary["skipped_updates"] += 1
+            continue
+        if not (item_data.get("doc_id") or (item_data.get("object_id") and item_data.get("object_id_field_name") and item_data.get("item_type_context"))):
+            logger.warning(f"Skipping item in job '{job_name}' (index {item_idx}) due to insufficient identifiers: {item_data}")
+            summary["skipped_updates"] += 1
+            continue
+        valid_items.append(item_data)
+
+    logger.info(f"Processing {len(valid_items)} metadata update items for job '{job_name}' in chunks of {METADATA_UPDATE_CHUNK_SIZE} using up to {max_updates} worker(s).")
+
+    for start in range(0, len(valid_items), METADATA_UPDATE_CHUNK_SIZE):
+        if daemon_paused.is_set():
+            logger.info(f"Daemon paused, stopping metadata updates for job '{job_name}'.")
+            break
+        if not cm_client:
+            logger.error(f"CMClient not available. Cannot process metadata updates for job '{job_name}'.")
+            pause_daemon("CMClient not available for metadata update job")
+            summary["failed_updates"] += len(valid_items) - start
+            break
 
-    logging.info(f"Processing {len(items_to_update)} metadata update items for job '{job_name}' using up to {max_updates} worker(s).")
-
-    with ThreadPoolExecutor(max_workers=max_updates) as executor:
-        futures = {}
-        for item_idx, item_data in enumerate(items_to_update):
-            if daemon_paused_due_to_cm_outage:
-                logging.info(f"Daemon paused, stopping submission of new metadata update tasks for job '{job_name}'.")
-                summary["skipped_updates"] += (len(items_to_update) - item_idx)
-                break
-            
-            if not cm_client:
-                logging.error(f"CMClient not available. Cannot submit metadata update tasks for job '{job_name}'.")
-                daemon_paused_due_to_cm_outage = True
-                summary["failed_updates"] += (len(items_to_update) - item_idx)
-                break
-
-            # Basic validation before submitting
-            if not item_data.get("metadata") or not isinstance(item_data.get("metadata"), dict):
-                logging.warning(f"Skipping item in job '{job_name}' (index {item_idx}) due to missing or invalid 'metadata': {item_data.get('doc_id') or item_data.get('object_id')}")
-                summary["skipped_updates"] += 1
-                continue
-            if not (item_data.get("doc_id") or (item_data.get("object_id") and item_data.get("object_id_field_name") and item_data.get("item_type_context"))):
-                logging.warning(f"Skipping item in job '{job_name}' (index {item_idx}) due to insufficient identifiers: {item_data}")
-                summary["skipped_updates"] += 1
-                continue
-
-            future = executor.submit(_process_single_metadata_update, item_data, job_name, cm_client)
-            item_identifier = item_data.get("doc_id") or item_data.get("object_id", "unknown_identifier")
-            futures[future] = item_identifier
-
-        for future in as_completed(futures):
-            submitted_identifier = futures[future]
-            try:
-                result = future.result()
-                logging.debug(f"Thread metadata update result for {submitted_identifier} (job: {job_name}): {result}")
-                status = result.get("status", "failed_unexpected_result_format")
-                if status == "success":
-                    summary["successful_updates"] += 1
-                elif status.startswith("skipped_"):
-                    summary["skipped_updates"] += 1
-                else:
-                    summary["failed_updates"] += 1
-            except CMConnectionError as e:
-                logging.error(f"CM connection error during threaded metadata update for {submitted_identifier} (job: {job_name}): {e}. Pausing daemon.")
-                daemon_paused_due_to_cm_outage = True
-                summary["failed_updates"] += 1
-                break 
-            except Exception as exc:
-                logging.error(f"Unexpected exception for {submitted_identifier} (job: {job_name}) during future.result(): {exc}", exc_info=True)
+        chunk = valid_items[start:start + METADATA_UPDATE_CHUNK_SIZE]
+        try:
+            outcomes = cm_client.update_document_metadata_bulk(chunk, max_workers=max_updates)
+        except CMConnectionError as e:
+            logger.error(f"CM connection error during metadata updates for job '{job_name}': {e}. Pausing daemon.")
+            pause_daemon(f"CM connection error during metadata update job '{job_name}'")
+            summary["failed_updates"] += len(chunk)
+            break
+        except Exception as exc:
+            logger.error(f"Unexpected exception during metadata updates for job '{job_name}': {exc}", exc_info=True)
+            summary["failed_updates"] += len(chunk)
+            continue
+
+        for item_data, update_success in zip(chunk, outcomes):
+            if update_success:
+                summary["successful_updates"] += 1
+            else:
+                logger.warning(f"Failed to update metadata for {item_data.get('doc_id') or item_data.get('object_id')} in job '{job_name}'.")
                 summary["failed_updates"] += 1
-            
-            if daemon_paused_due_to_cm_outage:
-                logging.warning(f"Daemon pause detected during future processing for metadata update job '{job_name}'. Halting results processing.")
-                break
     
     final_status = "success"
     message = f"Job '{job_name}' metadata update completed."
     total_items_in_job = len(items_to_update)
     processed_items_count = summary["successful_updates"] + summary["failed_updates"] + summary["skipped_updates"]
 
-    if daemon_paused_due_to_cm_outage and processed_items_count < total_items_in_job:
+    if daemon_paused.is_set() and processed_items_count < total_items_in_job:
         summary["skipped_updates"] += (total_items_in_job - processed_items_count)
         final_status = "partial_error"
         message = f"Job '{job_name}' metadata update processing interrupted by CM connection outage. Summary reflects tasks processed."
     elif summary["failed_updates"] > 0 or summary["skipped_updates"] > 0:
         final_status = "completed_with_issues"
         message = f"Job '{job_name}' metadata update completed with some issues. See summary."
-    elif daemon_paused_due_to_cm_outage: # Pause occurred but all submitted items were processed
+    elif daemon_paused.is_set(): # Pause occurred but all submitted items were processed
         final_status = "partial_error" # Still partial as daemon is now paused
         message = f"Job '{job_name}' metadata update completed, but a CM connection outage occurred, pausing the daemon."
 
     logger.info(f"Finished processing metadata update job '{job_name}'. Status: {final_status}. Summary: {summary}")
     return {"status": final_status, "message": message, "summary": summary}
 
+def _stop_log_queue_listener():
+    global _log_queue_listener
+    if _log_queue_listener is not None:
+        _log_queue_listener.stop() # Flushes records still in the queue
+        for h in _log_queue_listener.handlers:
+            h.close()
+        _log_queue_listener = None
+
 def setup_logging(logging_config):
     log_file_path = logging_config.get("log_file_path", "logs/daemon.log")
     log_level_str = logging_config.get("log_level", "INFO").upper()
@@ -459,12 +604,264 @@ def setup_logging(logging_config):
             if hasattr(h_existing, 'close'): # Check if handler has close method
                  h_existing.close()
     
-    root_logger.addHandler(handler)
+    # Worker threads only enqueue records; a single listener thread does the file writes and rotation
+    global _log_queue_listener
+    _stop_log_queue_listener()
+    log_queue = queue.SimpleQueue()
+    root_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    _log_queue_listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+    _log_queue_listener.start()
+    atexit.register(_stop_log_queue_listener)
 
     # Log confirmation using the newly configured logger
     logging.info(f"Logging configured: level={log_level_str}, file={log_file_path}, rotation(maxBytes={max_bytes}, backups={backup_count})")
     return True
 
+# Helper function for scan_directory
+def _process_single_file_upload(file_path, scan_config, cm_client, failed_archive_dir, move_target_dirs=None):
+    # scan_config is the ScanConfig built by scan_directory for this scan; move_target_dirs is its
+    # source directory -> move target directory cache, shared by all uploads of that scan
+    filename = os.path.basename(file_path)
+    action_after_upload = scan_config.action_after_upload
+    move_target_dir = scan_config.move_target_dir
+    scan_root_path = scan_config.path
+    current_file_root = os.path.dirname(file_path)
+
+    if daemon_paused.is_set(): # Leave the file in place for the next scan after reconnecting
+        return {"status": "skipped_paused", "file_path": file_path}
+
+    try:
+        if not cm_client: # Should be checked before submitting task ideally
+            logging.error(f"CMClient not available (thread). Cannot process file {file_path}.")
+            return {"status": "error_no_client", "file_path": file_path, "message": "CMClient not available"}
+
+        upload_metadata = {"source_filename": filename, "original_path": file_path}
+        logging.debug("Thread uploading %s with metadata %s", file_path, upload_metadata)
+        doc_id = cm_client.upload_document(file_path, scan_config.item_type, metadata=upload_metadata)
+
+        if doc_id:
+            # Kept at INFO: the only log record mapping a source file to its DocID. Per-file follow-ups are DEBUG;
+            # scan_directory logs one INFO summary per scan.
+            logging.info("Successfully uploaded %s (from %s), received DocID: %s", filename, file_path, doc_id)
+            if action_after_upload == "delete":
+                try:
+                    os.remove(file_path)
+                    logging.debug("Deleted file after upload: %s", file_path)
+                except OSError as e:
+                    logging.error(f"Failed to delete file {file_path} after upload: {e}")
+                    return {"status": "error_post_upload_delete", "file_path": file_path, "doc_id": doc_id, "message": str(e)}
+            elif action_after_upload == "move":
+                if not move_target_dir:
+                    logging.warning(f"Move action specified for {scan_root_path} but no move_target_directory configured. File {file_path} remains.")
+                    return {"status": "success_upload_only_no_move_dir", "file_path": file_path, "doc_id": doc_id, "message": "Move skipped, no target dir"}
+
+                effective_move_target_dir = move_target_dirs.get(current_file_root) if move_target_dirs is not None else None
+                if effective_move_target_dir is None:
+                    effective_move_target_dir = move_target_dir
+                    if scan_config.recursive and scan_root_path != current_file_root:
+                        relative_path = os.path.relpath(current_file_root, scan_root_path)
+                        if relative_path and relative_path != '.':
+                            effective_move_target_dir = os.path.join(move_target_dir, relative_path)
+                    if move_target_dirs is not None:
+                        move_target_dirs[current_file_root] = effective_move_target_dir # Same value from any thread
+                
+                try:
+                    _ensure_dir(effective_move_target_dir)
+                except OSError as e:
+                    logging.error(f"Failed to create move target directory {effective_move_target_dir}: {e}. Attempting to move to root archive.")
+                    effective_move_target_dir = move_target_dir 
+                    try:
+                        _ensure_dir(effective_move_target_dir)
+                    except OSError as e_root:
+                        logging.error(f"Root move target directory {effective_move_target_dir} also not creatable: {e_root}. Skipping move for {file_path}")
+                        return {"status": "error_post_upload_move_dir_creation", "file_path": file_path, "doc_id": doc_id, "message": f"Cannot create move dir {effective_move_target_dir}"}
+                destination_path = os.path.join(effective_move_target_dir, filename)
+                try:
+                    _move_file(file_path, destination_path)
+                except (OSError, shutil.Error) as e:
+                    # The target directory may have been removed or remounted since _ensure_dir cached it:
+                    # forget it, recreate it and try once more, so the file doesn't stay behind to be re-uploaded
+                    _forget_dir(effective_move_target_dir)
+                    logging.warning(f"Move of {file_path} to {effective_move_target_dir} failed ({e}); recreating the directory and retrying once.")
+                    try:
+                        _ensure_dir(effective_move_target_dir)
+                        _move_file(file_path, destination_path)
+                    except (OSError, shutil.Error) as e_retry:
+                        _forget_dir(effective_move_target_dir)
+                        logging.error(f"Failed to move file {file_path} to {effective_move_target_dir}: {e_retry}")
+                        return {"status": "error_post_upload_move_failed", "file_path": file_path, "doc_id": doc_id, "message": str(e_retry)}
+                logging.debug("Moved file %s to %s", file_path, destination_path)
+            return {"status": "success", "file_path": file_path, "doc_id": doc_id}
+        else: 
+            logging.warning(f"Upload of {filename} from {file_path} returned no DocID. Moving to failed archive.")
+            if os.path.exists(file_path):
+                move_to_failed_archive(file_path, failed_archive_dir, reason_subdir="upload_failure_no_docid")
+            return {"status": "failed_upload_no_docid", "file_path": file_path}
+    except CMConnectionError: 
+        raise 
+    except OSError as e: 
+        logging.error(f"OS error during file processing for {file_path} in thread: {e}")
+        return {"status": "error_os_level", "file_path": file_path, "message": str(e)}
+    except Exception as e:
+        logging.error(f"Unexpected error processing file {file_path} in thread: {e}", exc_info=True)
+        if os.path.exists(file_path): 
+            move_to_failed_archive(file_path, failed_archive_dir, reason_subdir="unexpected_processing_error_thread")
+        return {"status": "error_unexpected_thread", "file_path": file_path, "message": str(e)}
+
+def _iter_matching_files(root, recursive, matches_pattern):
+    """
+    Yields DirEntry objects for files under root whose normcased name satisfies matches_pattern.
+    Uses os.scandir so the file/directory type usually comes from the directory listing itself
+    instead of a stat per entry. Like os.walk, symlinked directories are not descended into.
+    """
+    dirs_to_visit = [root]
+    while dirs_to_visit:
+        current_dir = dirs_to_visit.pop()
+        try:
+            with os.scandir(current_dir) as entries:
+                for entry in entries:
+                    if recursive and entry.is_dir(follow_symlinks=False):
+                        dirs_to_visit.append(entry.path)
+                    elif entry.is_file() and matches_pattern(os.path.normcase(entry.name)):
+                        yield entry
+        except OSError as e:
+            logging.warning(f"Could not list directory {current_dir} during scan: {e}")
+
+def _smallest_first(entries, window):
+    """
+    Reorders DirEntry objects into paths, smallest file first within a sliding window of `window` entries,
+    so a few huge files at the head of a directory don't occupy every upload worker while small ones wait.
+    The first path is yielded once window + 1 entries have been seen, so keep the window small (scan_directory
+    uses its pending-upload limit) to let uploads start while the walk goes on. Costs one stat() per file.
+    Larger files are only postponed, never dropped.
+    """
+    heap = []
+    for seq, entry in enumerate(entries):
+        try:
+            size = entry.stat().st_size
+        except OSError: # Vanished or unreadable since listing; the upload attempt would fail the same way
+            continue
+        item = (size, seq, entry.path) # seq keeps equal sizes in discovery order
+        if len(heap) < window:
+            heapq.heappush(heap, item)
+        else:
+            yield heapq.heappushpop(heap, item)[2]
+    while heap:
+        yield heapq.heappop(heap)[2]
+
+def _max_parallel_uploads(global_config):
+    max_uploads = global_config.get("performance", {}).get("max_parallel_uploads", 1) 
+    if not isinstance(max_uploads, int) or max_uploads <= 0:
+        logging.warning(f"Invalid max_parallel_uploads value ({max_uploads}), defaulting to 1.")
+        max_uploads = 1
+    return _cap_workers(max_uploads, "max_parallel_uploads")
+
+def scan_directory(dir_config, cm_client, failed_archive_dir, global_config, executor=None): # Added global_config
+    """
+    Uploads the files matching dir_config from its scan path.
+    executor: long-lived upload pool from the daemon's main loop; without it a pool is created for this call.
+    """
+
+    path = dir_config.get("path")
+    item_type = dir_config.get("target_itemtype_cm")
+    file_pattern = dir_config.get("file_pattern", "*")
+    recursive_scan = dir_config.get("recursive_scan", False)
+    scan_config = ScanConfig(path, item_type, dir_config.get("action_after_upload"),
+                             dir_config.get("move_target_directory"), recursive_scan)
+
+    if not os.path.isdir(path):
+        logging.warning(f"Scan path {path} does not exist or is not a directory. Skipping.")
+        return
+
+    logging.info(f"Scanning directory: {path} (Recursive: {recursive_scan}, Pattern: {file_pattern}) for item type: {item_type}")
+    
+    max_uploads = _max_parallel_uploads(global_config)
+    
+    # Compile the glob once per scan; fnmatch.fnmatch would normcase and look the pattern up again for every file
+    matches_pattern = re.compile(fnmatch.translate(os.path.normcase(file_pattern))).match
+
+    logging.info(f"Submitting matching files in {path} using up to {max_uploads} worker(s).")
+    
+    successful_uploads_count = 0
+    submitted_files_count = 0
+
+    # Finished uploads are handled by a done-callback on the worker thread. The semaphore bounds the number of
+    # queued uploads, so a large tree never turns into one pending future per file.
+    max_pending = max_uploads * 2
+    pending_slots = threading.BoundedSemaphore(max_pending)
+    counts_lock = threading.Lock() # Guards successful_uploads_count and pending
+    pending = set() # Submitted uploads not finished yet; cancelled as soon as the daemon pauses
+    move_target_dirs = {} # Source directory -> move target, so relpath/join runs once per directory, not per file
+
+    def on_upload_done(future, file_path_submitted):
+        nonlocal successful_uploads_count
+        with counts_lock:
+            pending.discard(future)
+        if future.cancelled(): # Dropped from the queue after a CM outage; the file stays for the next scan
+            pending_slots.release()
+            return
+        try:
+            result = future.result() # This will re-raise CMConnectionError if it occurred in the thread
+            logging.debug("Thread processing result for %s: %s", file_path_submitted, result)
+            if result and result.get("status") == "success":
+                with counts_lock:
+                    successful_uploads_count += 1
+        except CMConnectionError as e:
+            logging.error(f"CM connection error during threaded operation for {file_path_submitted}: {e}. Pausing daemon.")
+            # Uploads still queued see the pause and return without touching CM
+            pause_daemon(f"CM connection error while uploading {file_path_submitted}")
+        except Exception as exc: # Catch other exceptions from future.result()
+            logging.error(f"Unexpected exception for file {file_path_submitted} during future.result(): {exc}", exc_info=True)
+            # Attempt to move the original file if it still exists and wasn't handled by the thread's own error handling
+            if os.path.exists(file_path_submitted):
+                move_to_failed_archive(file_path_submitted, failed_archive_dir, reason_subdir="executor_exception")
+        finally:
+            pending_slots.release()
+        if daemon_paused.is_set():
+            with counts_lock:
+                to_cancel = list(pending)
+            for queued in to_cancel: # Outside the lock: cancel() runs this callback for each cancelled future
+                queued.cancel()
+
+    own_executor = executor is None
+    if own_executor:
+        executor = ThreadPoolExecutor(max_workers=max_uploads, thread_name_prefix="cm-upload")
+    try:
+        # Files are submitted while the directory walk goes on, held back only by the small reordering
+        # window (max_pending entries), so uploads start long before a large walk is done
+        for fp in _smallest_first(_iter_matching_files(path, recursive_scan, matches_pattern), max_pending):
+            if daemon_paused.is_set(): # Check before submitting new tasks
+                logging.info(f"Daemon paused, stopping submission of new upload tasks for scan of {path}.")
+                break 
+            
+            if not cm_client: # Check if cm_client is available
+                logging.error(f"CMClient not available. Cannot submit task for file {fp}.")
+                pause_daemon("CMClient not available for directory scan") # Critical issue, pause daemon
+                break
+            
+            pending_slots.acquire()
+            try:
+                future = executor.submit(_process_single_file_upload, fp, scan_config, cm_client, failed_archive_dir,
+                                         move_target_dirs)
+            except Exception:
+                pending_slots.release() # Keep the final wait below from blocking on a slot nobody will free
+                raise
+            with counts_lock:
+                pending.add(future)
+            future.add_done_callback(functools.partial(on_upload_done, file_path_submitted=fp))
+            submitted_files_count += 1
+    finally:
+        # Every slot is back once all uploads of this scan have finished (the executor may outlive this call)
+        for _ in range(max_pending):
+            pending_slots.acquire()
+        if own_executor:
+            executor.shutdown(wait=True)
+
+    if submitted_files_count > 0:
+        logging.info(f"Finished scanning {path}. Submitted {submitted_files_count} files for processing, {successful_uploads_count} successful uploads confirmed in this cycle.")
+    elif not daemon_paused.is_set() : # Avoid logging "no files submitted" if paused mid-collection
+        logging.info(f"Finished scanning {path}. No files matching criteria were found in this cycle.")
+
 if __name__ == "__main__":
     # No initial basicConfig here. load_config will use root logger which has no handlers yet,
     # so its messages won't appear on console unless setup_logging fails and adds a console handler.
@@ -505,27 +902,42 @@ if __name__ == "__main__":
     if config:
         # ... (logging setup should have already happened if config is loaded) ...
         if 'ibm_cm_api_base_url' in config and 'authentication' in config:
-            cm_client = CMClient(config['ibm_cm_api_base_url'], config['authentication'])
+            # All job and scan workers share this client's session; unless configured, size its keep-alive
+            # pool so every worker of the largest pool can hold a warm connection (copy: config is cached)
+            auth_config = dict(config['authentication'])
+            performance = config.get("performance", {})
+            parallel_settings = [performance.get(k) for k in ("max_parallel_uploads", "max_parallel_downloads", "max_parallel_metadata_updates")]
+            largest_worker_pool = max([v for v in parallel_settings if isinstance(v, int) and v > 0] + [1])
+            auth_config.setdefault("http_pool_maxsize", max(64, largest_worker_pool * 2))
+            cm_client = CMClient(config['ibm_cm_api_base_url'], auth_config)
             logging.info("CMClient initialized.")
         else:
             logging.error("IBM CM API base URL or authentication details missing in config. Cannot initialize CMClient.")
             # Depending on policy, could exit or run in a degraded mode if other functionalities exist
 
     if cm_client: # Proceed only if CMClient is initialized
+        # Expose CMClient request/token metrics for Prometheus if a port is configured
+        metrics_port = config.get("daemon_settings", {}).get("metrics_port")
+        if metrics_port:
+            try:
+                start_http_server(int(metrics_port), registry=METRICS_REGISTRY)
+                logging.info(f"Metrics endpoint listening on port {metrics_port}.")
+            except (OSError, ValueError) as e:
+                logging.error(f"Could not start metrics endpoint on port {metrics_port}: {e}. Continuing without metrics.")
+
         # Initial connection test
-        global daemon_paused_due_to_cm_outage # Required to modify the global variable
         try:
             if not cm_client.test_connection():
                 logging.warning("Initial connection test to CM failed. Daemon will be paused.")
-                daemon_paused_due_to_cm_outage = True
+                pause_daemon("initial connection test failed")
             else:
                 logging.info("Successfully connected to CM on initial test.")
         except CMConnectionError as e:
             logging.error(f"Initial CM connection failed critically: {e}. Daemon is paused.")
-            daemon_paused_due_to_cm_outage = True
+            pause_daemon("initial connection test failed")
         except Exception as e: # Catch any other unexpected error during initial test
             logging.error(f"Unexpected error during initial CM connection test: {e}. Daemon is paused.")
-            daemon_paused_due_to_cm_outage = True
+            pause_daemon("initial connection test failed")
             
         failed_archive_dir = config.get("download_settings", {}).get("failed_archive_directory", "failed_archive")
         if not os.path.exists(failed_archive_dir):
@@ -537,17 +949,30 @@ if __name__ == "__main__":
                 # This might be a critical error depending on requirements.
 
         # This is a very basic continuous loop for demonstration.
+        # One-time scans (interval <= 0) that already ran; they stay off for this session unless config is reloaded
+        disabled_one_time_paths = set()
+        # One upload pool for the daemon's lifetime instead of new worker threads for every scan
+        upload_executor = ThreadPoolExecutor(max_workers=_max_parallel_uploads(config), thread_name_prefix="cm-upload")
+        reconnect_attempt = 0 # Consecutive failed reconnects, drives the backoff below
+        signal.signal(signal.SIGTERM, _handle_shutdown_signal)
+        if hasattr(signal, "SIGHUP"): # Not available on Windows
+            signal.signal(signal.SIGHUP, _handle_wakeup_signal)
         try:
-            while True: # Main daemon loop
-                global daemon_paused_due_to_cm_outage # Required to modify the global variable
-
-                if daemon_paused_due_to_cm_outage:
+            while not shutdown_event.is_set(): # Main daemon loop
+                if daemon_paused.is_set():
                     logging.info("Daemon is paused due to CM connection outage. Attempting to reconnect...")
-                    retry_interval = config.get("daemon_settings", {}).get("cm_connection_retry_interval_seconds", 60)
+                    daemon_settings = config.get("daemon_settings", {})
+                    # Full-jitter exponential backoff so many daemons don't all hit a recovering CM at the same moment
+                    retry_base = daemon_settings.get("cm_connection_retry_interval_seconds", 60)
+                    retry_cap = daemon_settings.get("cm_connection_retry_max_seconds", 300)
+                    retry_interval = round(random.uniform(0, min(retry_cap, retry_base * 2 ** min(reconnect_attempt, 10))), 1)
+                    reconnect_attempt += 1
                     try:
                         if cm_client and cm_client.test_connection():
-                            daemon_paused_due_to_cm_outage = False
+                            daemon_paused.clear()
+                            reconnect_attempt = 0
                             logging.info("CM connection restored. Resuming normal operations.")
+                            continue
                         else:
                             # test_connection returning False (but not raising CMConnectionError)
                             # is handled as still down.
@@ -557,19 +982,16 @@ if __name__ == "__main__":
                     except Exception as e: # Catch any other unexpected error during test_connection
                         logging.error(f"Unexpected error during CM reconnection attempt: {e}. Retrying in {retry_interval} seconds.")
                     
-                    time.sleep(retry_interval)
+                    _idle(retry_interval)
                     continue # Skip the rest of the loop and retry connection test
 
                 scan_configs_from_file = config.get("scan_directories", [])
-                # Create a deep copy for in-session modification (like disabling one-time scans)
-                # Note: json.loads(json.dumps(obj)) is a common way for deep copy of simple dicts/lists
-                current_scan_configs = json.loads(json.dumps(scan_configs_from_file))
-
-                active_scan_configs = [sc for sc in current_scan_configs if sc.get("enabled", True)]
+                active_scan_configs = [sc for sc in scan_configs_from_file
+                                       if sc.get("enabled", True) and sc.get("path") not in disabled_one_time_paths]
 
                 if not active_scan_configs:
                     logging.info("No active scan directories currently configured or enabled. Sleeping for 60s.")
-                    time.sleep(60)
+                    _idle(60)
                     continue # Re-evaluate after sleep, in case config changed (not implemented yet)
 
                 min_scan_interval = float('inf')
@@ -581,26 +1003,20 @@ if __name__ == "__main__":
                         continue
                     
                     logging.info(f"Processing scan configuration for: {path_to_scan}")
-                    scan_directory(dir_conf, cm_client, failed_archive_dir) 
+                    scan_directory(dir_conf, cm_client, failed_archive_dir, config, executor=upload_executor)
                     processed_paths_in_cycle.add(path_to_scan)
 
                     scan_interval = dir_conf.get("scan_interval_seconds", 0)
                     if scan_interval > 0:
                         min_scan_interval = min(min_scan_interval, scan_interval)
                     else: 
-                        # For one-time scans (interval <= 0), disable them in the current_scan_configs copy
-                        # This ensures they don't run again in this session unless config is reloaded.
-                        # Find the corresponding entry in current_scan_configs to modify its 'enabled' status.
+                        # For one-time scans (interval <= 0), disable them for the rest of this session.
                         # This relies on path_to_scan being a unique identifier for a scan config entry.
-                        for current_sc_entry in current_scan_configs:
-                            if current_sc_entry.get("path") == path_to_scan:
-                                current_sc_entry["enabled"] = False
-                                logging.info(f"One-time scan for {path_to_scan} complete. Disabling for this session.")
-                                break 
+                        disabled_one_time_paths.add(path_to_scan)
+                        logging.info(f"One-time scan for {path_to_scan} complete. Disabling for this session.")
                 
                 # Determine sleep time based on remaining active configurations
-                # Re-filter active_scan_configs from the potentially modified current_scan_configs
-                active_scan_configs = [sc for sc in current_scan_configs if sc.get("enabled", True)]
+                active_scan_configs = [sc for sc in active_scan_configs if sc.get("path") not in disabled_one_time_paths]
                 
                 active_recurring_configs_exist = any(sc.get("scan_interval_seconds", 0) > 0 for sc in active_scan_configs)
 
@@ -618,179 +1034,14 @@ if __name__ == "__main__":
                     sleep_duration = min_scan_interval if min_scan_interval != float('inf') else 60
                     logging.info(f"Next scan cycle in approximately {sleep_duration} seconds.")
                 
-                time.sleep(sleep_duration)
+                _idle(sleep_duration)
 
+            logging.info("Daemon shutting down due to SIGTERM.")
         except KeyboardInterrupt:
             logging.info("Daemon shutting down due to KeyboardInterrupt.")
         finally:
+            upload_executor.shutdown(wait=True, cancel_futures=True)
+            cm_client.close()
             logging.info("Daemon has shut down.")
     else:
         logging.error("CMClient not initialized. Daemon cannot proceed with scanning tasks.")
-
-# Helper function for scan_directory
-def _process_single_file_upload(file_path, item_type, dir_config, cm_client, failed_archive_dir):
-    # Note: global_config (or parts of it) might be needed if helper makes decisions based on it.
-    # For now, assuming dir_config and direct params are sufficient for this helper.
-    filename = os.path.basename(file_path)
-    action_after_upload = dir_config.get("action_after_upload")
-    move_target_dir = dir_config.get("move_target_directory")
-    scan_root_path = dir_config.get("path") 
-    current_file_root = os.path.dirname(file_path)
-
-    try:
-        if not cm_client: # Should be checked before submitting task ideally
-            logging.error(f"CMClient not available (thread). Cannot process file {file_path}.")
-            return {"status": "error_no_client", "file_path": file_path, "message": "CMClient not available"}
-
-        upload_metadata = {"source_filename": filename, "original_path": file_path}
-        logging.debug(f"Thread uploading {file_path} with metadata {upload_metadata}")
-        doc_id = cm_client.upload_document(file_path, item_type, metadata=upload_metadata)
-
-        if doc_id:
-            logging.info(f"Successfully uploaded {filename} (from {file_path}), received DocID: {doc_id}")
-            if action_after_upload == "delete":
-                try:
-                    os.remove(file_path)
-                    logging.info(f"Deleted file after upload: {file_path}")
-                except OSError as e:
-                    logging.error(f"Failed to delete file {file_path} after upload: {e}")
-                    return {"status": "error_post_upload_delete", "file_path": file_path, "doc_id": doc_id, "message": str(e)}
-            elif action_after_upload == "move":
-                if not move_target_dir:
-                    logging.warning(f"Move action specified for {scan_root_path} but no move_target_directory configured. File {file_path} remains.")
-                    return {"status": "success_upload_only_no_move_dir", "file_path": file_path, "doc_id": doc_id, "message": "Move skipped, no target dir"}
-
-                effective_move_target_dir = move_target_dir
-                if dir_config.get("recursive_scan", False) and scan_root_path != current_file_root:
-                    relative_path = os.path.relpath(current_file_root, scan_root_path)
-                    if relative_path and relative_path != '.':
-                        effective_move_target_dir = os.path.join(move_target_dir, relative_path)
-                
-                if not os.path.exists(effective_move_target_dir):
-                    try:
-                        os.makedirs(effective_move_target_dir, exist_ok=True)
-                    except OSError as e:
-                        logging.error(f"Failed to create move target directory {effective_move_target_dir}: {e}. Attempting to move to root archive.")
-                        effective_move_target_dir = move_target_dir 
-                        if not os.path.exists(effective_move_target_dir):
-                            try:
-                                os.makedirs(effective_move_target_dir, exist_ok=True)
-                            except OSError as e_root:
-                                logging.error(f"Root move target directory {effective_move_target_dir} also not creatable: {e_root}. Skipping move for {file_path}")
-                                return {"status": "error_post_upload_move_dir_creation", "file_path": file_path, "doc_id": doc_id, "message": f"Cannot create move dir {effective_move_target_dir}"}
-                try:
-                    destination_path = os.path.join(effective_move_target_dir, filename)
-                    shutil.move(file_path, destination_path)
-                    logging.info(f"Moved file {file_path} to {destination_path}")
-                except (OSError, shutil.Error) as e:
-                    logging.error(f"Failed to move file {file_path} to {effective_move_target_dir}: {e}")
-                    return {"status": "error_post_upload_move_failed", "file_path": file_path, "doc_id": doc_id, "message": str(e)}
-            return {"status": "success", "file_path": file_path, "doc_id": doc_id}
-        else: 
-            logging.warning(f"Upload of {filename} from {file_path} returned no DocID. Moving to failed archive.")
-            if os.path.exists(file_path):
-                move_to_failed_archive(file_path, failed_archive_dir, reason_subdir="upload_failure_no_docid")
-            return {"status": "failed_upload_no_docid", "file_path": file_path}
-    except CMConnectionError: 
-        raise 
-    except OSError as e: 
-        logging.error(f"OS error during file processing for {file_path} in thread: {e}")
-        return {"status": "error_os_level", "file_path": file_path, "message": str(e)}
-    except Exception as e:
-        logging.error(f"Unexpected error processing file {file_path} in thread: {e}", exc_info=True)
-        if os.path.exists(file_path): 
-            move_to_failed_archive(file_path, failed_archive_dir, reason_subdir="unexpected_processing_error_thread")
-        return {"status": "error_unexpected_thread", "file_path": file_path, "message": str(e)}
-
-def scan_directory(dir_config, cm_client, failed_archive_dir, global_config): # Added global_config
-    global daemon_paused_due_to_cm_outage 
-
-    path = dir_config.get("path")
-    item_type = dir_config.get("target_itemtype_cm")
-    file_pattern = dir_config.get("file_pattern", "*")
-    recursive_scan = dir_config.get("recursive_scan", False)
-
-    if not os.path.isdir(path):
-        logging.warning(f"Scan path {path} does not exist or is not a directory. Skipping.")
-        return
-
-    logging.info(f"Scanning directory: {path} (Recursive: {recursive_scan}, Pattern: {file_pattern}) for item type: {item_type}")
-    
-    max_uploads = global_config.get("performance", {}).get("max_parallel_uploads", 1) 
-    if not isinstance(max_uploads, int) or max_uploads <= 0:
-        logging.warning(f"Invalid max_parallel_uploads value ({max_uploads}), defaulting to 1.")
-        max_uploads = 1
-    
-    files_to_process = []
-    if recursive_scan:
-        for root, _, files in os.walk(path):
-            if daemon_paused_due_to_cm_outage: 
-                logging.info(f"Daemon paused, stopping file collection for recursive scan of {path}")
-                return # Return early if daemon is paused
-            for filename in files:
-                if fnmatch.fnmatch(filename, file_pattern):
-                    files_to_process.append(os.path.join(root, filename))
-    else: 
-        for filename in os.listdir(path):
-            if daemon_paused_due_to_cm_outage: 
-                logging.info(f"Daemon paused, stopping file collection for non-recursive scan of {path}")
-                return # Return early if daemon is paused
-            file_path_item = os.path.join(path, filename)
-            if os.path.isfile(file_path_item) and fnmatch.fnmatch(filename, file_pattern):
-                files_to_process.append(file_path_item)
-
-    if not files_to_process:
-        logging.info(f"No files matching criteria found in {path} for this scan cycle.")
-        return
-    
-    logging.info(f"Found {len(files_to_process)} files to potentially process in {path} using up to {max_uploads} worker(s).")
-    
-    successful_uploads_count = 0
-    submitted_files_count = 0
-
-    with ThreadPoolExecutor(max_workers=max_uploads) as executor:
-        futures = {}
-        for fp in files_to_process:
-            if daemon_paused_due_to_cm_outage: # Check before submitting new tasks
-                logging.info(f"Daemon paused, stopping submission of new upload tasks for scan of {path}.")
-                break 
-            
-            if not cm_client: # Check if cm_client is available
-                logging.error(f"CMClient not available. Cannot submit task for file {fp}.")
-                daemon_paused_due_to_cm_outage = True # Critical issue, pause daemon
-                break
-            
-            # Submit task to the executor
-            future = executor.submit(_process_single_file_upload, fp, item_type, dir_config, cm_client, failed_archive_dir)
-            futures[future] = fp # Store future to map back to file_path if needed
-            submitted_files_count += 1
-
-        for future in as_completed(futures):
-            file_path_submitted = futures[future]
-            try:
-                result = future.result() # This will re-raise CMConnectionError if it occurred in the thread
-                logging.debug(f"Thread processing result for {file_path_submitted}: {result}")
-                if result and result.get("status") == "success":
-                    successful_uploads_count += 1
-            except CMConnectionError as e:
-                logging.error(f"CM connection error during threaded operation for {file_path_submitted}: {e}. Pausing daemon.")
-                daemon_paused_due_to_cm_outage = True
-                # Python 3.9+ allows executor.shutdown(cancel_futures=True)
-                # For broader compatibility, we break and rely on the main loop's pause logic.
-                # Any already running tasks will complete or error out.
-                # New tasks are not submitted due to the check in the submission loop.
-                break # Stop processing further results for this scan_directory call
-            except Exception as exc: # Catch other exceptions from future.result()
-                logging.error(f"Unexpected exception for file {file_path_submitted} during future.result(): {exc}", exc_info=True)
-                # Attempt to move the original file if it still exists and wasn't handled by the thread's own error handling
-                if os.path.exists(file_path_submitted):
-                     move_to_failed_archive(file_path_submitted, failed_archive_dir, reason_subdir="executor_exception")
-            
-            if daemon_paused_due_to_cm_outage: # If a parallel task set the pause flag
-                logging.warning("Daemon pause detected during future processing. Halting results processing for current scan of {path}.")
-                break # Stop processing results for this scan directory
-
-    if submitted_files_count > 0:
-        logging.info(f"Finished scanning {path}. Submitted {submitted_files_count} files for processing, {successful_uploads_count} successful uploads confirmed in this cycle.")
-    elif not daemon_paused_due_to_cm_outage : # Avoid logging "no files submitted" if paused mid-collection
-        logging.info(f"Finished scanning {path}. No files were submitted for processing in this cycle (either none found or daemon was already paused).")
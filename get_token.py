@@ -1,36 +1,72 @@
 #!/usr/bin/env python
+import functools
+import logging
 import requests
-import json
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import orjson
 import os
-import re # For token extraction
 import keyring
-import sys # For stderr
+
+# The daemon imports this module and fetches tokens in-process, so everything goes through logging
+# (never the token itself); the command-line entry point below sets up console output.
+logger = logging.getLogger(__name__)
 
 # Script is expected to be in the project root. Config is in ./config/credentials.json
 DEFAULT_CREDENTIALS_PATH = os.path.abspath(os.path.join(
     os.path.dirname(__file__), 'config', 'credentials.json'
 ))
 
+# Keys the credentials file must provide for the keyring lookup, and all values required after it
+# ('username' stands in for a missing keyring_username, so only these two are checked before the lookup)
+_KEYRING_REQUIRED_KEYS = frozenset({"service_name", "keyring_username"})
+_FINAL_REQUIRED_KEYS = frozenset({"login_url", "login_host", "username", "password", "servername", "service_name"})
+
+# Set CM_TOKEN_DEBUG=1 to log the login response headers and body
+VERBOSE = os.environ.get('CM_TOKEN_DEBUG') == '1'
+
+# Shared session so repeated token fetches (e.g. the daemon's refreshes) reuse a warm keep-alive/TLS connection.
+# Retry covers connection errors; the login POST itself is not re-sent on 5xx (urllib3 never retries POST by status).
+_session = requests.Session()
+_adapter = HTTPAdapter(pool_connections=8, pool_maxsize=32,
+                       max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=(502, 503, 504)))
+_session.mount("https://", _adapter)
+_session.mount("http://", _adapter) # login_url may be plain http (see config/credentials.json)
+
+@functools.lru_cache(maxsize=4)
+def _read_credentials_file(credentials_path, mtime_ns, size):
+    # mtime_ns and size are only part of the cache key: an edited file is read again
+    with open(credentials_path, 'rb') as f:
+        return orjson.loads(f.read())
+
+@functools.lru_cache(maxsize=8)
+def _cached_password(service_name, username):
+    # Each keyring lookup is an IPC round trip to the platform keychain. Cleared when the login is rejected
+    # (see fetch_token_with_expiry) and when no password is found, so a newly stored password is picked up.
+    return keyring.get_password(service_name, username)
+
 def load_credentials(credentials_path=DEFAULT_CREDENTIALS_PATH):
-    """Loads login credentials from a JSON file and retrieves password from keyring."""
+    """
+    Loads login credentials from a JSON file and retrieves password from keyring.
+    The parsed file is cached until its mtime or size changes, so token refreshes don't re-read it.
+    """
     try:
-        with open(credentials_path, 'r') as f:
-            loaded_creds = json.load(f)
+        st = os.stat(credentials_path)
+        loaded_creds = dict(_read_credentials_file(credentials_path, st.st_mtime_ns, st.st_size)) # Copy: the password is added below
         # print(f"Credentials JSON part loaded successfully from {credentials_path}") # Less verbose for script use
     except FileNotFoundError:
-        print(f"ERROR: Credentials file not found: {credentials_path}", file=sys.stderr)
+        logger.error(f"Credentials file not found: {credentials_path}")
         return None
-    except json.JSONDecodeError as e:
-        print(f"ERROR: Error decoding JSON from {credentials_path}: {e}", file=sys.stderr)
+    except orjson.JSONDecodeError as e:
+        logger.error(f"Error decoding JSON from {credentials_path}: {e}")
         return None
     except Exception as e:
-        print(f"ERROR: An unexpected error occurred while loading credentials JSON from {credentials_path}: {e}", file=sys.stderr)
+        logger.error(f"An unexpected error occurred while loading credentials JSON from {credentials_path}: {e}")
         return None
 
     # Check for keys needed for keyring lookup
-    keyring_related_keys = ["service_name", "keyring_username", "username"] # username from JSON is used if keyring_username is missing
-    if not all(key in loaded_creds for key in keyring_related_keys[:2]): # service_name and keyring_username are essential for keyring
-        print(f"ERROR: Credentials file {credentials_path} is missing 'service_name' or 'keyring_username'. Required for keyring lookup.", file=sys.stderr)
+    if not _KEYRING_REQUIRED_KEYS <= loaded_creds.keys(): # service_name and keyring_username are essential for keyring
+        logger.error(f"Credentials file {credentials_path} is missing 'service_name' or 'keyring_username'. Required for keyring lookup.")
         return None
     
     service_name = loaded_creds["service_name"]
@@ -38,14 +74,15 @@ def load_credentials(credentials_path=DEFAULT_CREDENTIALS_PATH):
     keyring_username_to_use = loaded_creds.get("keyring_username", loaded_creds.get("username"))
 
     if not keyring_username_to_use: # Ensure we have a username for keyring.
-        print(f"ERROR: 'keyring_username' (or fallback 'username') not found in credentials for service '{service_name}'.", file=sys.stderr)
+        logger.error(f"'keyring_username' (or fallback 'username') not found in credentials for service '{service_name}'.")
         return None
 
-    print(f"Attempting to retrieve password from keyring for service '{service_name}' and username '{keyring_username_to_use}'...")
-    password = keyring.get_password(service_name, keyring_username_to_use)
+    logger.debug("Retrieving password from keyring for service '%s' and username '%s'.", service_name, keyring_username_to_use)
+    password = _cached_password(service_name, keyring_username_to_use)
 
     if password is None or password == "":
-        print(f"ERROR: Password not found in keyring for service '{service_name}' and username '{keyring_username_to_use}'. Please store it first using 'keyring set {service_name} {keyring_username_to_use}'.", file=sys.stderr)
+        _cached_password.cache_clear()
+        logger.error(f"Password not found in keyring for service '{service_name}' and username '{keyring_username_to_use}'. Please store it first using 'keyring set {service_name} {keyring_username_to_use}'.")
         return None
     
     loaded_creds["password"] = password
@@ -54,27 +91,28 @@ def load_credentials(credentials_path=DEFAULT_CREDENTIALS_PATH):
     # Validate all required keys for the application are now present
     # Note: 'password' is now populated from keyring.
     # 'service_name' and 'keyring_username' were checked before keyring call.
-    final_required_keys = ["login_url", "login_host", "username", "password", "servername", "service_name"]
     # keyring_username is optional if username is used as fallback, but its presence was effectively checked.
-    
-    missing_keys = [key for key in final_required_keys if key not in loaded_creds or not loaded_creds[key]]
+    missing_keys = sorted(key for key in _FINAL_REQUIRED_KEYS if not loaded_creds.get(key))
     if missing_keys:
-        print(f"ERROR: Credentials configuration is missing one or more required values after keyring lookup: {missing_keys}", file=sys.stderr)
+        logger.error(f"Credentials configuration is missing one or more required values after keyring lookup: {missing_keys}")
         return None
         
     return loaded_creds
 
-def fetch_token():
+def fetch_token_with_expiry(session=None):
     """
     Fetches the bearer token from the CM8 server using credentials from config/credentials.json
     and password from the system keyring.
-    Prints status code, response text, and the extracted token.
-    Returns the token if successful, None otherwise.
+    session is the requests.Session to log in with (e.g. CMClient's, so login shares its keep-alive pool);
+    the module's own pooled session is used if it is None.
+    Logs progress and errors, but never the token (the response headers and body only if CM_TOKEN_DEBUG=1).
+    Returns a (token, expires_in) tuple if successful, (None, None) otherwise.
+    expires_in is the token lifetime in seconds if the server reports one, else None.
     """
     credentials = load_credentials()
     if not credentials:
-        # load_credentials already printed specific errors to stderr
-        return None
+        # load_credentials already logged the specific error
+        return None, None
 
     # All required keys, including 'password', should be present if load_credentials succeeded.
     # The check in load_credentials is now the primary validation point for required fields.
@@ -83,7 +121,11 @@ def fetch_token():
     login_url_dynamic = credentials["login_url"]
     login_headers_dynamic = {
         "Content-Type": "application/json",
-        "Host": credentials["login_host"]
+        "Host": credentials["login_host"],
+        # A passed-in session (e.g. CMClient's) carries the current API token and Accept header;
+        # None drops them so the login host, which may be another server, never sees that token.
+        "Authorization": None,
+        "Accept": None
     }
     login_data_dynamic = {
         "username": credentials["username"],
@@ -91,60 +133,70 @@ def fetch_token():
         "servername": credentials["servername"]
     }
 
-    print(f"Attempting to fetch token from: {login_url_dynamic}")
+    logger.info("Attempting to fetch token from: %s", login_url_dynamic)
     try:
-        response = requests.post(login_url_dynamic, headers=login_headers_dynamic, json=login_data_dynamic, timeout=10)
+        response = (session or _session).post(login_url_dynamic, headers=login_headers_dynamic, json=login_data_dynamic, timeout=10)
         
-        print(f"Response Status Code: {response.status_code}")
-        print("Response Headers:")
-        for key, value in response.headers.items():
-            print(f"  {key}: {value}")
-        print("Response Body (text):")
-        print(response.text)
+        logger.debug("Token response status code: %s", response.status_code)
+        if VERBOSE: # Decoding the body and walking the headers is only worth it when debugging
+            logger.info("Response Headers:\n%s", "\n".join(f"  {key}: {value}" for key, value in response.headers.items()))
+            logger.info("Response Body (text):\n%s", response.text)
 
         if response.status_code == 200:
             # The token is directly in the body, prefixed by "Bearer "
             # Example response body: "Bearer eyJhbGciOiJkaXIiLCJlbmMiOiJBMjU2R0NNIn0..."
-            response_body = response.text.strip()
-            if response_body.startswith("Bearer "):
-                token = response_body[len("Bearer "):].strip()
+            # Check the prefix on the raw bytes; only the token itself gets decoded
+            response_body = response.content.strip()
+            if response_body.startswith(b"Bearer "):
+                token = response_body[len(b"Bearer "):].strip().decode("utf-8")
                 if token:
-                    print(f"Successfully extracted Bearer Token: {token}")
-                    return token
+                    logger.info("Successfully extracted Bearer Token.")
+                    return token, None # Plain text response carries no expiry information
                 else:
-                    print("Error: 'Bearer ' prefix found but token is empty.")
-                    return None
+                    logger.error("'Bearer ' prefix found but token is empty.")
+                    return None, None
             else:
                 # Fallback for JSON response, though the primary expectation is plain text "Bearer <token>"
                 try:
-                    json_response = response.json()
-                    if "token" in json_response:
+                    json_response = orjson.loads(response.content) # Parses the raw bytes, skipping the text decode
+                    if isinstance(json_response, dict) and "token" in json_response:
                         token = json_response["token"]
-                        print(f"Successfully extracted Bearer Token from JSON response: {token}")
-                        return token
+                        logger.info("Successfully extracted Bearer Token from JSON response.")
+                        return token, json_response.get("expires_in")
                     else:
-                        print("Error: Token not found in JSON response. 'token' key missing.")
-                        return None
-                except json.JSONDecodeError:
-                    print("Error: Response body does not start with 'Bearer ' and is not valid JSON.")
-                    return None
+                        logger.error("Token not found in JSON response. 'token' key missing.")
+                        return None, None
+                except orjson.JSONDecodeError:
+                    logger.error("Response body does not start with 'Bearer ' and is not valid JSON.")
+                    return None, None
         else:
-            print(f"Error: Failed to fetch token. Status code: {response.status_code}")
-            return None
+            logger.error("Failed to fetch token. Status code: %s", response.status_code)
+            if response.status_code in (401, 403): # The password may have changed in the keyring
+                _cached_password.cache_clear()
+            return None, None
 
     except requests.exceptions.RequestException as e:
-        print(f"Error: An exception occurred while requesting the token: {e}")
-        return None
+        logger.error("An exception occurred while requesting the token: %s", e)
+        return None, None
     except Exception as e:
-        print(f"An unexpected error occurred: {e}")
-        return None
+        logger.error("An unexpected error occurred while fetching the token: %s", e)
+        return None, None
+
+def fetch_token(session=None):
+    """
+    Fetches the bearer token. See fetch_token_with_expiry().
+    Returns the token if successful, None otherwise.
+    """
+    token, _ = fetch_token_with_expiry(session)
+    return token
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
     token = fetch_token()
     if token:
         # In a real scenario, this token would be used by another part of the application.
         # For this script, just printing it is sufficient for verification.
-        pass 
+        print(f"Bearer Token: {token}")
     else:
         print("Failed to retrieve token.")
         # Potentially exit with an error code if this script is meant to be called by others
@@ -1,8 +1,12 @@
+import asyncio
+import base64
 import unittest
 from unittest import mock
 import os
+import threading
+import time
 import sys
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
 
 # Add project root and daemon package to sys.path
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
@@ -10,7 +14,7 @@ daemon_path = os.path.join(project_root, 'daemon')
 sys.path.insert(0, project_root)
 sys.path.insert(0, daemon_path)
 
-from cm_client import CMClient, CMConnectionError
+from cm_client import AsyncCMClient, CMClient, CMConnectionError, METRICS_REGISTRY, _body_preview
 import requests # For requests.exceptions.HTTPError
 
 class TestCMClient(unittest.TestCase):
@@ -22,60 +26,120 @@ class TestCMClient(unittest.TestCase):
         }
         self.client = CMClient("http://fake-api-base", self.mock_auth_config)
 
-    @mock.patch('daemon.cm_client.subprocess.run')
-    def test_fetch_new_token_from_script_success(self, mock_subprocess_run):
-        mock_process_result = mock.Mock()
-        mock_process_result.returncode = 0
-        mock_process_result.stdout = "Some output\nSuccessfully extracted Bearer Token: new_script_token\nMore output"
-        mock_process_result.stderr = ""
-        mock_subprocess_run.return_value = mock_process_result
+    @mock.patch('cm_client.fetch_token_with_expiry')
+    def test_fetch_new_token_from_script_success(self, mock_fetch_token_with_expiry):
+        mock_fetch_token_with_expiry.return_value = ("new_script_token", None)
 
         result = self.client._fetch_new_token_from_script()
         self.assertTrue(result)
         self.assertEqual(self.client._bearer_token, "new_script_token")
-        mock_subprocess_run.assert_called_once()
-        # Check if the script path is correct (Python 3.7+ for full_script_path access)
-        args, _ = mock_subprocess_run.call_args
-        script_path_called = args[0][1] # command is like [sys.executable, script_path]
-        expected_script_path = os.path.abspath(os.path.join(os.path.dirname(daemon_path), 'get_token.py')) # daemon_path is daemon_cm_client's dir
-        self.assertEqual(script_path_called, expected_script_path)
-
-
-    @mock.patch('daemon.cm_client.subprocess.run')
-    def test_fetch_new_token_from_script_failure_script_error(self, mock_subprocess_run):
-        mock_process_result = mock.Mock()
-        mock_process_result.returncode = 1
-        mock_process_result.stdout = ""
-        mock_process_result.stderr = "Script error"
-        mock_subprocess_run.return_value = mock_process_result
+        self.assertEqual(self.client._session.headers["Authorization"], "Bearer new_script_token")
+        mock_fetch_token_with_expiry.assert_called_once_with(self.client._session)
+        # No expiry reported, so the default lifetime applies
+        expected_renewal = time.monotonic() + 3600 - 300
+        self.assertAlmostEqual(self.client._token_renews_at_mono, expected_renewal, delta=5)
+
+    @mock.patch('cm_client.fetch_token_with_expiry')
+    def test_fetch_new_token_from_script_uses_reported_expiry(self, mock_fetch_token_with_expiry):
+        mock_fetch_token_with_expiry.return_value = ("new_script_token", 1200)
 
         result = self.client._fetch_new_token_from_script()
-        self.assertFalse(result)
-        self.assertIsNone(self.client._bearer_token)
+        self.assertTrue(result)
+        expected_renewal = time.monotonic() + 1200 - 300
+        self.assertAlmostEqual(self.client._token_renews_at_mono, expected_renewal, delta=5)
 
-    @mock.patch('daemon.cm_client.subprocess.run')
-    def test_fetch_new_token_from_script_failure_no_token_in_output(self, mock_subprocess_run):
-        mock_process_result = mock.Mock()
-        mock_process_result.returncode = 0
-        mock_process_result.stdout = "No token here"
-        mock_process_result.stderr = ""
-        mock_subprocess_run.return_value = mock_process_result
+    @mock.patch('cm_client.fetch_token_with_expiry')
+    def test_fetch_new_token_from_script_ignores_non_numeric_expiry(self, mock_fetch_token_with_expiry):
+        mock_fetch_token_with_expiry.return_value = ("new_script_token", "soon")
+
+        result = self.client._fetch_new_token_from_script()
+        self.assertTrue(result)
+        # Falls back to the default lifetime instead of failing in the refresh thread
+        expected_renewal = time.monotonic() + 3600 - 300
+        self.assertAlmostEqual(self.client._token_renews_at_mono, expected_renewal, delta=5)
+
+    @mock.patch('cm_client.fetch_token_with_expiry')
+    def test_fetch_new_token_from_script_failure_no_token(self, mock_fetch_token_with_expiry):
+        mock_fetch_token_with_expiry.return_value = (None, None)
 
         result = self.client._fetch_new_token_from_script()
         self.assertFalse(result)
         self.assertIsNone(self.client._bearer_token)
-    
-    @mock.patch('daemon.cm_client.subprocess.run')
-    def test_fetch_new_token_from_script_subprocess_exception(self, mock_subprocess_run):
-        mock_subprocess_run.side_effect = subprocess.TimeoutExpired(cmd="get_token.py", timeout=10)
+
+    @mock.patch('cm_client.fetch_token_with_expiry')
+    def test_fetch_new_token_from_script_exception(self, mock_fetch_token_with_expiry):
+        mock_fetch_token_with_expiry.side_effect = RuntimeError("No keyring backend")
         result = self.client._fetch_new_token_from_script()
         self.assertFalse(result)
         self.assertIsNone(self.client._bearer_token)
 
 
-    @mock.patch('daemon.cm_client.CMClient._fetch_new_token_from_script')
+    @mock.patch('cm_client.fetch_token_with_expiry')
+    def test_initial_jwt_token_used_until_exp(self, mock_fetch_token_with_expiry):
+        claims = base64.urlsafe_b64encode(b'{"exp": %d}' % (time.time() + 3600)).rstrip(b'=').decode()
+        jwt = f"eyJhbGciOiJIUzI1NiJ9.{claims}.signature"
+        client = CMClient(api_base_url="https://cm.example.com", auth_config={"bearer_token": jwt})
+
+        self.assertEqual(client.get_bearer_token(), jwt)
+        mock_fetch_token_with_expiry.assert_not_called()
+        self.assertAlmostEqual(client._token_renews_at_mono, time.monotonic() + 3600 - 300, delta=5)
+
+    def test_initial_opaque_token_renewed_on_first_call(self):
+        client = CMClient(api_base_url="https://cm.example.com", auth_config={"bearer_token": "opaque_token"})
+        self.assertEqual(client._bearer_token, "opaque_token")
+        self.assertTrue(client._is_token_expiring())
+
+    @mock.patch('cm_client.fetch_token_with_expiry')
+    def test_get_bearer_token_fast_path_while_fresh(self, mock_fetch_token_with_expiry):
+        mock_fetch_token_with_expiry.return_value = ("fresh_token", 3600)
+        self.assertEqual(self.client.get_bearer_token(), "fresh_token")
+
+        with mock.patch.object(self.client, '_is_token_expiring') as mock_expiring:
+            self.assertEqual(self.client.get_bearer_token(), "fresh_token")
+            mock_expiring.assert_not_called()
+        mock_fetch_token_with_expiry.assert_called_once()
+
+        self.client._set_bearer_token(None) # e.g. after a 401: the fast path must not serve a cleared token
+        self.assertEqual(self.client.get_bearer_token(), "fresh_token")
+        self.assertEqual(mock_fetch_token_with_expiry.call_count, 2)
+
+    @mock.patch('cm_client.fetch_token_with_expiry')
+    def test_submit_token_refresh_skips_fetch_when_token_already_renewed(self, mock_fetch_token_with_expiry):
+        # A caller that saw an expiring token but got the lock after another caller's fetch finished
+        self.client._set_bearer_token("renewed_token")
+        self.client._token_renews_at_mono = time.monotonic() + 3600
+
+        self.assertTrue(self.client._submit_token_refresh().result(timeout=5))
+        mock_fetch_token_with_expiry.assert_not_called()
+
+    @mock.patch('cm_client.fetch_token_with_expiry')
+    def test_get_bearer_token_stale_refreshes_in_background(self, mock_fetch_token_with_expiry):
+        self.client._bearer_token = "current_token"
+        self.client._token_renews_at_mono = time.monotonic() + 600
+        self.client._token_stale_at_mono = time.monotonic() - 1
+        mock_fetch_token_with_expiry.return_value = ("refreshed_token", None)
+
+        # The current token is served immediately while the refresh runs off the request path
+        self.assertEqual(self.client.get_bearer_token(), "current_token")
+        self.assertTrue(self.client._refresh_future.result())
+        self.assertEqual(self.client.get_bearer_token(), "refreshed_token")
+        mock_fetch_token_with_expiry.assert_called_once_with(self.client._session)
+
+    @mock.patch('cm_client.fetch_token_with_expiry')
+    def test_get_bearer_token_expired_blocks_for_refresh(self, mock_fetch_token_with_expiry):
+        self.client._bearer_token = "expired_token"
+        self.client._token_renews_at_mono = time.monotonic() - 1
+        mock_fetch_token_with_expiry.return_value = ("refreshed_token", None)
+
+        self.assertEqual(self.client.get_bearer_token(), "refreshed_token")
+        mock_fetch_token_with_expiry.assert_called_once_with(self.client._session)
+
+    @mock.patch('cm_client.CMClient._fetch_new_token_from_script')
     @mock.patch('daemon.cm_client.requests.Session.request')
     def test_request_auth_retry_success(self, mock_session_request, mock_fetch_token):
+        # Start with a token the client considers valid; the server rejects it with 401
+        self.client._set_bearer_token("initial_token")
+        self.client._token_renews_at_mono = time.monotonic() + 3600
         # Initial call fails with 401
         mock_response_401 = mock.Mock()
         mock_response_401.status_code = 401
@@ -89,16 +153,16 @@ class TestCMClient(unittest.TestCase):
         mock_response_200 = mock.Mock()
         mock_response_200.status_code = 200
         mock_response_200.headers = {'Content-Type': 'application/json'}
-        mock_response_200.json.return_value = {"data": "success"}
+        mock_response_200.content = b'{"data": "success"}'
         mock_response_200.raise_for_status.return_value = None # No error on 200
 
         mock_session_request.side_effect = [mock_response_401, mock_response_200]
         
         # Mock _fetch_new_token_from_script to succeed and set a token
         def fake_fetch_token():
-            self.client._bearer_token = "newly_fetched_token"
+            self.client._set_bearer_token("newly_fetched_token")
             # Simulate _update_renewal_time behavior
-            self.client._token_renews_at = datetime.now() + timedelta(seconds=self.mock_auth_config["default_token_validity_seconds"])
+            self.client._token_renews_at_mono = time.monotonic() + self.mock_auth_config["default_token_validity_seconds"]
             return True
         mock_fetch_token.side_effect = fake_fetch_token
 
@@ -107,14 +171,16 @@ class TestCMClient(unittest.TestCase):
         self.assertEqual(response, {"data": "success"})
         self.assertEqual(mock_session_request.call_count, 2)
         mock_fetch_token.assert_called_once()
-        # Check Authorization header on the second call
-        second_call_headers = mock_session_request.call_args_list[1][1]['headers']
-        self.assertEqual(second_call_headers['Authorization'], "Bearer newly_fetched_token")
+        # The retried call picks up the new Authorization header from the session
+        self.assertEqual(self.client._session.headers['Authorization'], "Bearer newly_fetched_token")
 
 
-    @mock.patch('daemon.cm_client.CMClient._fetch_new_token_from_script')
+    @mock.patch('cm_client.CMClient._fetch_new_token_from_script')
     @mock.patch('daemon.cm_client.requests.Session.request')
     def test_request_auth_retry_fails_after_token_refresh(self, mock_session_request, mock_fetch_token):
+        # Start with a token the client considers valid; the server rejects it with 401
+        self.client._set_bearer_token("initial_token")
+        self.client._token_renews_at_mono = time.monotonic() + 3600
         # Initial call fails with 401
         mock_response_401_first = mock.Mock()
         mock_response_401_first.status_code = 401
@@ -130,8 +196,8 @@ class TestCMClient(unittest.TestCase):
         mock_session_request.side_effect = [mock_response_401_first, mock_response_401_second]
         
         def fake_fetch_token():
-            self.client._bearer_token = "newly_fetched_token_again"
-            self.client._token_renews_at = datetime.now() + timedelta(seconds=3600)
+            self.client._set_bearer_token("newly_fetched_token_again")
+            self.client._token_renews_at_mono = time.monotonic() + 3600
             return True
         mock_fetch_token.side_effect = fake_fetch_token
 
@@ -141,9 +207,12 @@ class TestCMClient(unittest.TestCase):
         self.assertEqual(mock_session_request.call_count, 2)
         mock_fetch_token.assert_called_once()
 
-    @mock.patch('daemon.cm_client.CMClient._fetch_new_token_from_script')
+    @mock.patch('cm_client.CMClient._fetch_new_token_from_script')
     @mock.patch('daemon.cm_client.requests.Session.request')
     def test_request_auth_retry_fails_token_refresh_fails(self, mock_session_request, mock_fetch_token):
+        # Start with a token the client considers valid; the server rejects it with 401
+        self.client._set_bearer_token("initial_token")
+        self.client._token_renews_at_mono = time.monotonic() + 3600
         mock_response_401 = mock.Mock()
         mock_response_401.status_code = 401
         http_error_401 = requests.exceptions.HTTPError(response=mock_response_401)
@@ -167,10 +236,263 @@ class TestCMClient(unittest.TestCase):
 
         # Set a dummy token to bypass initial fetch for this test
         self.client._bearer_token = "dummy_token"
-        self.client._token_renews_at = datetime.now() + timedelta(hours=1)
+        self.client._token_renews_at_mono = time.monotonic() + 3600
 
         with self.assertRaises(CMConnectionError):
             self.client._request("GET", "/test-endpoint")
 
+    @mock.patch('cm_client.requests.Session.request')
+    def test_request_accepts_timeout_override(self, mock_session_request):
+        mock_response = mock.Mock()
+        mock_response.status_code = 200
+        mock_response.headers = {'Content-Type': 'application/json'}
+        mock_response.content = b'{"status": "ok"}'
+        mock_session_request.return_value = mock_response
+        self.client._set_bearer_token("dummy_token")
+        self.client._token_renews_at_mono = time.monotonic() + 3600
+
+        self.assertEqual(self.client._request("GET", "/", timeout=10), {"status": "ok"})
+        self.assertEqual(mock_session_request.call_args[1]['timeout'], 10)
+
+    @mock.patch('requests.Session.request')
+    def test_request_records_latency_metric(self, mock_session_request):
+        mock_response = mock.Mock()
+        mock_response.status_code = 204
+        mock_session_request.return_value = mock_response
+        self.client._set_bearer_token("dummy_token")
+        self.client._token_renews_at_mono = time.monotonic() + 3600
+        labels = {"method": "DELETE", "status": "204"}
+        before = METRICS_REGISTRY.get_sample_value("cm_request_seconds_count", labels) or 0
+
+        self.client._request("DELETE", "items/doc1")
+        self.assertEqual(METRICS_REGISTRY.get_sample_value("cm_request_seconds_count", labels), before + 1)
+
+    @mock.patch('requests.Session.request')
+    def test_delete_document_does_not_read_body_and_reports_4xx(self, mock_session_request):
+        self.client._set_bearer_token("dummy_token")
+        self.client._token_renews_at_mono = time.monotonic() + 3600
+        ok_response = mock.Mock(status_code=204)
+        mock_session_request.return_value = ok_response
+        self.assertTrue(self.client.delete_document("doc1"))
+
+        not_found = mock.Mock(status_code=404, text="Not Found")
+        not_found.raise_for_status.side_effect = requests.exceptions.HTTPError(response=not_found)
+        mock_session_request.return_value = not_found
+        self.assertFalse(self.client.delete_document("doc1"))
+
+    @mock.patch('requests.Session.request')
+    def test_request_revalidates_get_with_etag(self, mock_session_request):
+        self.client._set_bearer_token("dummy_token")
+        self.client._token_renews_at_mono = time.monotonic() + 3600
+        first = mock.Mock(status_code=200, headers={'Content-Type': 'application/json', 'ETag': '"v1"'}, content=b'{"results": [{"id": "doc1"}]}')
+        not_modified = mock.Mock(status_code=304, headers={'ETag': '"v1"'}, content=b'')
+        mock_session_request.side_effect = [first, not_modified]
+
+        self.assertEqual(self.client._request("GET", "search", params={"q": "x"}), {"results": [{"id": "doc1"}]})
+        self.assertEqual(self.client._request("GET", "search", params={"q": "x"}), {"results": [{"id": "doc1"}]})
+        self.assertIsNone(mock_session_request.call_args_list[0][1]['headers'])
+        self.assertEqual(mock_session_request.call_args_list[1][1]['headers'], {'If-None-Match': '"v1"'})
+
+    def test_test_connection_reuses_result_until_connection_error(self):
+        with mock.patch.object(self.client, '_check_connection', return_value=True) as mock_check:
+            self.assertTrue(self.client.test_connection())
+            self.assertTrue(self.client.test_connection())
+            self.assertEqual(mock_check.call_count, 1)
+
+            with mock.patch.object(self.client._session, 'request', side_effect=requests.exceptions.ConnectionError("down")):
+                self.client._set_bearer_token("dummy_token")
+                self.client._token_renews_at_mono = time.monotonic() + 3600
+                with self.assertRaises(CMConnectionError):
+                    self.client._request("GET", "search")
+            self.client.test_connection()
+            self.assertEqual(mock_check.call_count, 2)
+
+    def test_body_preview_truncates_large_error_pages(self):
+        response = mock.Mock(content=b"<html>" + b"x" * 100000)
+        self.assertEqual(len(_body_preview(response)), 512)
+        self.assertEqual(_body_preview(None), "")
+
+    def test_session_pool_size_from_config(self):
+        client = CMClient(api_base_url="https://cm.example.com", auth_config={"http_pool_maxsize": 8})
+        adapter = client._session.get_adapter("https://cm.example.com")
+        self.assertEqual(adapter._pool_maxsize, 8)
+        self.assertEqual(self.client._session.get_adapter("https://cm.example.com")._pool_maxsize, 64)
+
+    def test_session_retries_only_idempotent_methods(self):
+        retry = self.client._session.get_adapter("https://cm.example.com").max_retries
+        self.assertEqual(retry.total, 3)
+        self.assertIn(503, retry.status_forcelist)
+        self.assertGreater(retry.backoff_jitter, 0)
+        self.assertTrue(retry.is_retry("GET", 503))
+        self.assertFalse(retry.is_retry("POST", 503))
+
+    def test_iter_search_documents_pages_until_short_page(self):
+        pages = {0: {"results": [{"id": "doc1"}, {"id": "doc2"}]}, 2: {"results": [{"id": "doc3"}]}}
+        with mock.patch.object(self.client, '_request', side_effect=lambda method, endpoint, params: pages[params["offset"]]) as mock_request:
+            results = list(self.client.iter_search_documents({"oid_attr": "A"}, page_size=2))
+
+        self.assertEqual([r["id"] for r in results], ["doc1", "doc2", "doc3"])
+        self.assertEqual(mock_request.call_count, 2)
+        self.assertEqual(mock_request.call_args[1]["params"], {"q": "@oid_attr='A'", "limit": 2, "offset": 2})
+
+    def test_search_documents_max_results_limits_request(self):
+        with mock.patch.object(self.client, '_request', return_value={"results": [{"id": "doc1"}, {"id": "doc2"}]}) as mock_request:
+            results = self.client.search_documents({"oid_attr": "A"}, max_results=2)
+
+        self.assertEqual(len(results), 2)
+        mock_request.assert_called_once_with("GET", "search", params={"q": "@oid_attr='A'", "limit": 2, "offset": 0})
+
+    def test_update_document_metadata_bulk_resolves_object_ids_once(self):
+        items = [
+            {"doc_id": "doc1", "metadata": {"a": 1}},
+            {"object_id": "OID-2", "object_id_field_name": "oid_attr", "item_type_context": "Document", "metadata": {"a": 2}},
+            {"object_id": "OID-3", "object_id_field_name": "oid_attr", "item_type_context": "Document", "metadata": {"a": 3}},
+        ]
+        with mock.patch.object(self.client, 'resolve_object_ids', return_value={"OID-2": "doc2"}) as mock_resolve, \
+             mock.patch.object(self.client, 'update_document_metadata', return_value=True) as mock_update:
+            outcome = self.client.update_document_metadata_bulk(items)
+
+        self.assertEqual(outcome, [True, True, False]) # OID-3 was not found
+        mock_resolve.assert_called_once_with(["OID-2", "OID-3"], "oid_attr", item_type_context="Document")
+        self.assertEqual(sorted(c.args for c in mock_update.call_args_list), [("doc1", {"a": 1}), ("doc2", {"a": 2})])
+
+    def test_build_search_query_reuses_template_per_shape(self):
+        first = self.client._build_search_query({"oid_attr": "A", "status": "new"}, item_type_context="Document")
+        second = self.client._build_search_query({"oid_attr": "B", "status": "{done}"}, item_type_context="Document")
+
+        self.assertEqual(first, "itemtype='Document' AND @oid_attr='A' AND @status='new'")
+        self.assertEqual(second, "itemtype='Document' AND @oid_attr='B' AND @status='{done}'")
+        self.assertEqual(len(self.client._query_template_cache), 1)
+        self.assertIsNone(self.client._build_search_query({}))
+
+    def test_search_documents_caches_identical_queries(self):
+        with mock.patch.object(self.client, '_request', return_value={"results": [{"id": "doc1"}]}) as mock_request:
+            first = self.client.search_documents({"oid_attr": "A"}, item_type_context="Document")
+            second = self.client.search_documents({"oid_attr": "A"}, item_type_context="Document")
+            self.assertEqual(first, second)
+            self.assertEqual(mock_request.call_count, 1)
+
+            self.client.invalidate_search_cache()
+            self.client.search_documents({"oid_attr": "A"}, item_type_context="Document")
+            self.assertEqual(mock_request.call_count, 2)
+
+    def test_search_cache_is_bounded_and_drops_expired_entries(self):
+        self.client.SEARCH_CACHE_SIZE = 2
+        with mock.patch.object(self.client, '_request', return_value={"results": [{"id": "doc1"}]}):
+            for value in ("A", "B", "C"):
+                self.client.search_documents({"oid_attr": value})
+            self.assertEqual(len(self.client._search_cache), 2)
+
+            later = time.monotonic() + self.client.SEARCH_CACHE_TTL_SECONDS + 1
+            with mock.patch('cm_client.time.monotonic', return_value=later):
+                self.client.search_documents({"oid_attr": "D"})
+            # The insert first pruned the expired entries, so only the new one is left
+            self.assertEqual(list(self.client._search_cache), [(None, (("oid_attr", "D"),), None)])
+
+    def test_resolve_object_ids_single_query(self):
+        with mock.patch.object(self.client, '_request') as mock_request:
+            mock_request.return_value = {"results": [
+                {"id": "doc1", "attributes": {"oid_attr": "A"}},
+                {"id": "doc2", "oid_attr": "B"},
+                {"id": "doc3", "attributes": {"oid_attr": "A"}}, # Duplicate, first one wins
+            ]}
+            resolved = self.client.resolve_object_ids(["A", "B", "C", "A"], "oid_attr", item_type_context="Document")
+
+        self.assertEqual(resolved, {"A": "doc1", "B": "doc2"})
+        mock_request.assert_called_once_with("GET", "search", params={
+            "q": "itemtype='Document' AND (@oid_attr='A' OR @oid_attr='B' OR @oid_attr='C')"
+        })
+
+    def test_resolve_object_id_lone_caller_resolves_immediately(self):
+        with mock.patch.object(self.client, 'resolve_object_ids', return_value={"A": "doc1"}) as mock_resolve:
+            self.assertEqual(self.client._resolve_object_id("A", "oid_attr", "Document"), "doc1")
+        mock_resolve.assert_called_once()
+
+    def test_resolve_object_id_coalesces_lookups_behind_inflight_resolve(self):
+        first_started = threading.Event()
+        release_first = threading.Event()
+        batches = []
+
+        def fake_resolve(object_ids, field_name, item_type):
+            batches.append(sorted(object_ids))
+            if len(batches) == 1:
+                first_started.set()
+                release_first.wait(5)
+            return {"A": "doc1", "B": "doc2", "C": "doc3"}
+
+        with mock.patch.object(self.client, 'resolve_object_ids', side_effect=fake_resolve):
+            with ThreadPoolExecutor(max_workers=3) as executor:
+                future_a = executor.submit(self.client._resolve_object_id, "A", "oid_attr", "Document")
+                self.assertTrue(first_started.wait(5))
+                future_b = executor.submit(self.client._resolve_object_id, "B", "oid_attr", "Document")
+                future_c = executor.submit(self.client._resolve_object_id, "C", "oid_attr", "Document")
+                # Let B and C queue up behind A's resolve before it finishes
+                deadline = time.monotonic() + 5
+                while time.monotonic() < deadline:
+                    with self.client._object_id_lock:
+                        pending = self.client._pending_object_ids.get(("oid_attr", "Document"), {})
+                        if len(pending) == 2:
+                            break
+                    time.sleep(0.005)
+                release_first.set()
+                self.assertEqual([future_a.result(), future_b.result(), future_c.result()], ["doc1", "doc2", "doc3"])
+
+        self.assertEqual(batches, [["A"], ["B", "C"]])
+
+    def test_resolve_object_ids_results_with_only_id(self):
+        with mock.patch.object(self.client, '_request') as mock_request:
+            # Single ObjectID: the result needs no echo of the attribute
+            mock_request.return_value = {"results": [{"id": "doc1"}]}
+            self.assertEqual(self.client.resolve_object_ids(["A"], "oid_attr"), {"A": "doc1"})
+
+            # Several ObjectIDs: results can't be matched, so each one is looked up on its own
+            mock_request.reset_mock()
+            mock_request.side_effect = [
+                {"results": [{"id": "doc1"}, {"id": "doc2"}]},
+                {"results": [{"id": "doc1"}]},
+                {"results": [{"id": "doc2"}]},
+            ]
+            self.assertEqual(self.client.resolve_object_ids(["A", "B"], "oid_attr"), {"A": "doc1", "B": "doc2"})
+            self.assertEqual(mock_request.call_count, 3)
+
+    def test_resolve_object_ids_escapes_quotes(self):
+        with mock.patch.object(self.client, '_request', return_value={"results": []}) as mock_request:
+            self.client.resolve_object_ids(["O'Brien"], "oid_attr", item_type_context="Doc'Type")
+        mock_request.assert_called_once_with("GET", "search", params={
+            "q": "itemtype='Doc''Type' AND (@oid_attr='O''Brien')"
+        })
+
+    def test_bulk_delete_reports_per_document_outcome(self):
+        with mock.patch.object(self.client, 'delete_document', side_effect=lambda doc_id: doc_id != "doc2") as mock_delete:
+            results = self.client.bulk_delete(["doc1", "doc2", "doc3"])
+
+        self.assertEqual(results, {"doc1": True, "doc2": False, "doc3": True})
+        self.assertEqual(mock_delete.call_count, 3)
+
+    def test_bulk_download_passes_target_paths(self):
+        with mock.patch.object(self.client, 'download_document', return_value=True) as mock_download:
+            results = self.client.bulk_download([("doc1", "/tmp/a"), ("doc2", "/tmp/b")])
+
+        self.assertEqual(results, {"doc1": True, "doc2": True})
+        mock_download.assert_any_call("doc1", "/tmp/a")
+        mock_download.assert_any_call("doc2", "/tmp/b")
+
+    def test_download_documents_async(self):
+        with mock.patch.object(self.client, 'download_document', side_effect=lambda doc_id, path: doc_id == "doc1"):
+            results = asyncio.run(self.client.download_documents_async([("doc1", "/tmp/a"), ("doc2", "/tmp/b")]))
+
+        self.assertEqual(results, {"doc1": True, "doc2": False})
+
+    def test_async_client_runs_operations_concurrently(self):
+        async def update_all():
+            async with AsyncCMClient(self.client, max_concurrency=4) as async_client:
+                return await asyncio.gather(*(async_client.update_document_metadata(doc_id, {"a": 1}) for doc_id in ("doc1", "doc2", "doc3")))
+
+        with mock.patch.object(self.client, 'update_document_metadata', side_effect=lambda doc_id, *args, **kwargs: doc_id != "doc2") as mock_update:
+            results = asyncio.run(update_all())
+
+        self.assertEqual(results, [True, False, True])
+        self.assertEqual(mock_update.call_count, 3)
+
 if __name__ == '__main__':
     unittest.main()
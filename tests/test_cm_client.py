@@ -1,8 +1,9 @@
 import unittest
 from unittest.mock import patch, Mock, mock_open
-from datetime import datetime, timedelta
 import os # Needed for os.path.basename if testing upload
 import json # For metadata in upload
+import tempfile
+import time
 
 # Adjust import path if your project structure requires it (e.g., if 'daemon' is a top-level dir)
 # Assuming 'daemon' is in the python path or this test is run from project root.
@@ -35,77 +36,73 @@ class TestCMClient(unittest.TestCase):
     def test_initial_token_present(self):
         self.assertEqual(self.client._bearer_token, "initial_token")
 
-    def test_refresh_token_success(self):
+    @patch('daemon.cm_client.fetch_token_with_expiry')
+    def test_refresh_token_success(self, mock_fetch_token_with_expiry):
         # Simulate token expiration
-        self.client._token_renews_at = datetime.now() - timedelta(seconds=10)
+        self.client._token_renews_at_mono = time.monotonic() - 10
+        mock_fetch_token_with_expiry.return_value = ("new_refreshed_token", 1800)
 
-        # Configure mock response for token renewal
-        mock_response = Mock()
-        mock_response.status_code = 200
-        mock_response.json.return_value = {"access_token": "new_refreshed_token", "expires_in": 1800}
-        self.mock_session_request.return_value = mock_response
-
-        self.assertTrue(self.client._refresh_token())
+        self.assertTrue(self.client._submit_token_refresh().result(timeout=5))
         self.assertEqual(self.client._bearer_token, "new_refreshed_token")
         # Check if the renewal time was updated (approximate check)
-        self.assertTrue(self.client._token_renews_at > datetime.now() + timedelta(seconds=1800 - self.client.token_expiry_threshold_seconds - 60)) # -60 for buffer
-        self.mock_session_request.assert_called_once_with(
-            "POST", self.mock_config_dict["authentication"]["token_renewal_url"], timeout=10
-        )
-    
-    def test_refresh_token_failure_api_error(self):
-        self.client._token_renews_at = datetime.now() - timedelta(seconds=10)
-        mock_response = Mock()
-        mock_response.status_code = 500
-        # Simulate the behavior of response.raise_for_status() for a 500 error
-        mock_response.raise_for_status.side_effect = CMConnectionError("Server Error") # Simulate HTTPError leading to CMConnectionError
-        # For the actual _refresh_token error handling, it expects requests.exceptions.HTTPError
-        # and then checks status code. Let's align with that.
-        mock_http_error = requests.exceptions.HTTPError("Server Error", response=mock_response)
-        mock_http_error.response = mock_response # Ensure response attribute is set
-        mock_response.raise_for_status.side_effect = mock_http_error
-        mock_response.text = "Internal Server Error Text"
-
-
-        self.mock_session_request.return_value = mock_response
-        
-        self.assertFalse(self.client._refresh_token())
+        self.assertTrue(self.client._token_renews_at_mono > time.monotonic() + 1800 - self.client.token_expiry_threshold_seconds - 60) # -60 for buffer
+        mock_fetch_token_with_expiry.assert_called_once_with(self.client._session)
+
+    @patch('daemon.cm_client.fetch_token_with_expiry')
+    def test_refresh_token_failure_api_error(self, mock_fetch_token_with_expiry):
+        self.client._token_renews_at_mono = time.monotonic() - 10
+        # get_token reports a failed login (e.g. a 500 from the login endpoint) as no token
+        mock_fetch_token_with_expiry.return_value = (None, None)
+
+        self.assertFalse(self.client._fetch_new_token_from_script())
         self.assertEqual(self.client._bearer_token, "initial_token") # Should not change
+        self.mock_session_request.assert_not_called()
 
-    @patch('builtins.open', new_callable=mock_open, read_data=b"file_content")
-    @patch('os.path.basename', return_value="test_file.txt")
-    def test_upload_document_success(self, mock_basename, mock_file_open):
+    def test_upload_document_success(self):
         # Mock successful response for upload
         mock_upload_response = Mock()
         mock_upload_response.status_code = 201 # Typically 201 Created
-        mock_upload_response.json.return_value = {"id": "doc123_uploaded", "version": "1"}
+        mock_upload_response.headers = {'Content-Type': 'application/json'}
+        mock_upload_response.content = b'{"id": "doc123_uploaded", "version": "1"}'
         
         # Ensure the token is considered valid and doesn't need refresh
         self.client._bearer_token = "valid_token_for_upload"
-        self.client._token_renews_at = datetime.now() + timedelta(hours=1)
+        self.client._token_renews_at_mono = time.monotonic() + 3600
         
         self.mock_session_request.return_value = mock_upload_response
 
-        doc_id = self.client.upload_document("dummy/path/test_file.txt", "TestItemType", {"custom_attr": "value"})
+        # The multipart body is streamed from a real file handle, so use a temporary file
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_path = os.path.join(tmp_dir, "test_file.txt")
+            with open(file_path, "wb") as f:
+                f.write(b"file_content")
+            doc_id = self.client.upload_document(file_path, "TestItemType", {"custom_attr": "value"})
         
         self.assertEqual(doc_id, "doc123_uploaded")
         # Check that self.mock_session_request was called correctly for the upload
         args, kwargs = self.mock_session_request.call_args
         self.assertEqual(args[0], "POST") # Method
         self.assertTrue(args[1].endswith("/items")) # URL
-        self.assertIn("files", kwargs)
+        self.assertNotIn("files", kwargs) # Body is streamed through a MultipartEncoder
         self.assertIn("data", kwargs)
-        self.assertIn("attributes", kwargs["data"])
-        # Can add more assertions on kwargs['files'] and kwargs['data'] structure
-        attributes_json = json.loads(kwargs["data"]["attributes"]) # Ensure metadata is JSON string
+        self.assertIn("attributes", kwargs["data"].fields)
+        self.assertIn("file", kwargs["data"].fields)
+        self.assertEqual(kwargs["headers"]["Content-Type"], kwargs["data"].content_type)
+        self.assertNotIn("Content-Length", kwargs["headers"]) # requests derives it from the encoder's len
+        self.assertEqual(kwargs["data"].fields["file"][0], "test_file.txt")
+        attributes_json = json.loads(kwargs["data"].fields["attributes"]) # Ensure metadata is JSON string
         self.assertEqual(attributes_json["itemtype"], "TestItemType")
         self.assertEqual(attributes_json["custom_attr"], "value")
 
 
+    def test_upload_document_missing_file(self):
+        self.assertIsNone(self.client.upload_document("dummy/path/missing_file.txt", "TestItemType"))
+        self.mock_session_request.assert_not_called()
+
     def test_upload_document_connection_error(self):
         # Ensure the token is considered valid to avoid refresh attempt
         self.client._bearer_token = "valid_token_for_upload"
-        self.client._token_renews_at = datetime.now() + timedelta(hours=1)
+        self.client._token_renews_at_mono = time.monotonic() + 3600
 
         # Simulate a connection error during the request for upload
         self.mock_session_request.side_effect = CMConnectionError("Network issue")
@@ -116,6 +113,12 @@ class TestCMClient(unittest.TestCase):
                 result = self.client.upload_document("dummy/path/test_file.txt", "TestItemType")
                 self.assertIsNone(result)
 
+    def test_context_manager_closes_session(self):
+        with patch.object(self.client._session, 'close') as mock_close:
+            with self.client as client:
+                self.assertIs(client, self.client)
+            mock_close.assert_called_once()
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,3 +1,4 @@
+import io
 import unittest
 from unittest import mock
 import os
@@ -32,6 +33,9 @@ class TestGetToken(unittest.TestCase):
         # This ensures get_token.load_credentials() reads our dummy file.
         self.credentials_patcher = mock.patch('get_token.DEFAULT_CREDENTIALS_PATH', self.credentials_file)
         self.mock_default_credentials_path = self.credentials_patcher.start()
+        # Each test rewrites the file, possibly within the same mtime tick; start from an empty parse cache
+        get_token._read_credentials_file.cache_clear()
+        get_token._cached_password.cache_clear()
 
     def tearDown(self):
         self.credentials_patcher.stop()
@@ -47,7 +51,7 @@ class TestGetToken(unittest.TestCase):
                 pass # Ignore if not empty, another test might be using it or left files.
 
 
-    @mock.patch('get_token.requests.post')
+    @mock.patch('get_token._session.post')
     @mock.patch('get_token.keyring.get_password')
     def test_fetch_token_success_plain_text(self, mock_keyring_get_password, mock_post):
         mock_keyring_get_password.return_value = "dummy_keyring_password"
@@ -59,10 +63,8 @@ class TestGetToken(unittest.TestCase):
 
         mock_response.status_code = 200
         mock_response.text = "Bearer test_token_123"
+        mock_response.content = b"Bearer test_token_123"
         mock_response.headers = {'Content-Type': 'text/plain'}
-        def json_side_effect(*args, **kwargs): # Define side effect for .json()
-            raise json.JSONDecodeError("Not JSON", "test", 0)
-        mock_response.json.side_effect = json_side_effect
         mock_post.return_value = mock_response
 
         token = get_token.fetch_token()
@@ -70,12 +72,51 @@ class TestGetToken(unittest.TestCase):
         mock_keyring_get_password.assert_called_once_with("test_service", "test_keyring_user")
         mock_post.assert_called_once_with(
             "http://fake-cm-server/login",
-            headers={"Content-Type": "application/json", "Host": "fake-cm-server"},
+            headers={"Content-Type": "application/json", "Host": "fake-cm-server", "Authorization": None, "Accept": None},
             json={"username": "testuser", "password": "dummy_keyring_password", "servername": "testserver"},
             timeout=10 
         )
 
-    @mock.patch('get_token.requests.post')
+    @mock.patch('get_token._session.post')
+    @mock.patch('get_token.keyring.get_password')
+    def test_fetch_token_does_not_output_token(self, mock_keyring_get_password, mock_post):
+        mock_keyring_get_password.return_value = "dummy_keyring_password"
+        mock_post.return_value.status_code = 200
+        mock_post.return_value.content = b"Bearer secret_token_789"
+
+        with mock.patch('sys.stdout', new=io.StringIO()) as captured_stdout:
+            with self.assertLogs('get_token', level='DEBUG') as captured_logs:
+                self.assertEqual(get_token.fetch_token(), "secret_token_789")
+        self.assertEqual(captured_stdout.getvalue(), "")
+        self.assertNotIn("secret_token_789", "\n".join(captured_logs.output))
+
+    @mock.patch('get_token.keyring.get_password')
+    def test_fetch_token_does_not_send_session_authorization(self, mock_keyring_get_password):
+        mock_keyring_get_password.return_value = "dummy_keyring_password"
+        session = get_token.requests.Session()
+        session.headers.update({"Authorization": "Bearer live_api_token", "Accept": "application/json"})
+        sent_response = mock.Mock(status_code=200, content=b"Bearer new_token")
+
+        with mock.patch.object(session, 'send', return_value=sent_response) as mock_send:
+            self.assertEqual(get_token.fetch_token(session), "new_token")
+        sent_request = mock_send.call_args[0][0]
+        self.assertNotIn("Authorization", sent_request.headers)
+        self.assertNotEqual(sent_request.headers.get("Accept"), "application/json")
+
+    @mock.patch('get_token._session.post')
+    @mock.patch('get_token.keyring.get_password')
+    def test_fetch_token_uses_given_session(self, mock_keyring_get_password, mock_default_post):
+        mock_keyring_get_password.return_value = "dummy_keyring_password"
+        session = mock.Mock()
+        session.post.return_value.status_code = 200
+        session.post.return_value.content = b"Bearer session_token"
+        session.post.return_value.headers = {'Content-Type': 'text/plain'}
+
+        self.assertEqual(get_token.fetch_token(session), "session_token")
+        session.post.assert_called_once()
+        mock_default_post.assert_not_called()
+
+    @mock.patch('get_token._session.post')
     @mock.patch('get_token.keyring.get_password')
     def test_fetch_token_success_json_response(self, mock_keyring_get_password, mock_post):
         mock_keyring_get_password.return_value = "dummy_keyring_password"
@@ -84,7 +125,7 @@ class TestGetToken(unittest.TestCase):
         # Simulate a non "Bearer " prefixed body, forcing JSON parse
         mock_response.text = '{"token": "json_token_456"}' 
         mock_response.headers = {'Content-Type': 'application/json'}
-        mock_response.json.return_value = {"token": "json_token_456"}
+        mock_response.content = b'{"token": "json_token_456"}'
         mock_post.return_value = mock_response
 
         token = get_token.fetch_token()
@@ -92,26 +133,38 @@ class TestGetToken(unittest.TestCase):
         mock_keyring_get_password.assert_called_once_with("test_service", "test_keyring_user")
         mock_post.assert_called_once_with(
             "http://fake-cm-server/login",
-            headers={"Content-Type": "application/json", "Host": "fake-cm-server"},
+            headers={"Content-Type": "application/json", "Host": "fake-cm-server", "Authorization": None, "Accept": None},
             json={"username": "testuser", "password": "dummy_keyring_password", "servername": "testserver"},
             timeout=10
         )
 
-    @mock.patch('get_token.requests.post')
+    @mock.patch('get_token._session.post')
     @mock.patch('get_token.keyring.get_password')
     def test_fetch_token_http_error(self, mock_keyring_get_password, mock_post):
         mock_keyring_get_password.return_value = "dummy_keyring_password"
         mock_response = mock.Mock()
         mock_response.status_code = 401
         mock_response.text = "Unauthorized"
+        mock_response.headers = {'Content-Type': 'text/plain'}
         mock_post.return_value = mock_response
 
         token = get_token.fetch_token()
         self.assertIsNone(token)
         mock_keyring_get_password.assert_called_once_with("test_service", "test_keyring_user")
 
+        # The rejected password is not reused for the next attempt
+        get_token.fetch_token()
+        self.assertEqual(mock_keyring_get_password.call_count, 2)
+
+    @mock.patch('get_token.keyring.get_password')
+    def test_load_credentials_caches_keyring_password(self, mock_keyring_get_password):
+        mock_keyring_get_password.return_value = "dummy_keyring_password"
+        self.assertEqual(get_token.load_credentials()["password"], "dummy_keyring_password")
+        self.assertEqual(get_token.load_credentials()["password"], "dummy_keyring_password")
+        mock_keyring_get_password.assert_called_once_with("test_service", "test_keyring_user")
+
 
-    @mock.patch('get_token.requests.post')
+    @mock.patch('get_token._session.post')
     @mock.patch('get_token.keyring.get_password')
     def test_fetch_token_request_exception(self, mock_keyring_get_password, mock_post):
         mock_keyring_get_password.return_value = "dummy_keyring_password"
@@ -121,17 +174,15 @@ class TestGetToken(unittest.TestCase):
         self.assertIsNone(token)
         mock_keyring_get_password.assert_called_once_with("test_service", "test_keyring_user")
 
-    @mock.patch('get_token.requests.post')
+    @mock.patch('get_token._session.post')
     @mock.patch('get_token.keyring.get_password')
     def test_fetch_token_malformed_bearer(self, mock_keyring_get_password, mock_post):
         mock_keyring_get_password.return_value = "dummy_keyring_password"
         mock_response = mock.Mock()
         mock_response.status_code = 200
         mock_response.text = "Bearer " # Empty token
+        mock_response.content = b"Bearer "
         mock_response.headers = {'Content-Type': 'text/plain'}
-        def json_side_effect(*args, **kwargs):
-            raise json.JSONDecodeError("Not JSON", "test", 0)
-        mock_response.json.side_effect = json_side_effect
         mock_post.return_value = mock_response
         
         token = get_token.fetch_token()
@@ -187,15 +238,24 @@ class TestGetToken(unittest.TestCase):
         
         creds = get_token.load_credentials() # Uses the path patched in setUp
         self.assertIsNone(creds)
-        mock_open_custom.assert_called_once_with(self.credentials_file, 'r')
+        mock_open_custom.assert_called_once_with(self.credentials_file, 'rb')
 
 
-    @mock.patch('get_token.open', new_callable=mock.mock_open, read_data="this is not json")
+    @mock.patch('get_token.open', new_callable=mock.mock_open, read_data=b"this is not json")
     def test_load_credentials_json_decode_error(self, mock_file_open_custom):
         # This test uses the mocked DEFAULT_CREDENTIALS_PATH from setUp
         creds = get_token.load_credentials()
         self.assertIsNone(creds)
-        mock_file_open_custom.assert_called_once_with(self.credentials_file, 'r')
+        mock_file_open_custom.assert_called_once_with(self.credentials_file, 'rb')
+
+    @mock.patch('get_token.keyring.get_password')
+    def test_load_credentials_reuses_parsed_file(self, mock_keyring_get_password):
+        mock_keyring_get_password.return_value = "dummy_keyring_password"
+        first = get_token.load_credentials()
+        second = get_token.load_credentials()
+        self.assertEqual(first, second)
+        self.assertIsNot(first, second) # Callers get their own copy with the password filled in
+        self.assertEqual(get_token._read_credentials_file.cache_info().misses, 1)
 
 
 if __name__ == '__main__':